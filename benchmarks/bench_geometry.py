@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of the scalar and array geometry helpers in UsefulMath.
+
+Evaluates every pig against every faucet the way PigMaps does: IoU, centers,
+resized faucet boxes and movement/faucet dot products.
+
+Usage:
+    python benchmarks/bench_geometry.py --pigs 20 --faucets 2 --repeat 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from UsefulMath import UMath  # noqa: E402
+
+
+def random_boxes(rng, count, width=1280, height=720, size=(40, 200)):
+    x1 = rng.uniform(0, width - size[1], count)
+    y1 = rng.uniform(0, height - size[1], count)
+    w = rng.uniform(size[0], size[1], count)
+    h = rng.uniform(size[0], size[1], count)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1).astype(np.float32)
+
+
+def scalar_path(umath, pig_boxes, faucet_boxes, movement):
+    faucets = [umath.resize_bbox(160, box) for box in faucet_boxes]
+    faucet_centers = [umath.get_center(box) for box in faucets]
+    results = []
+    for pig_box, vector in zip(pig_boxes, movement):
+        pig_center = umath.get_center(pig_box)
+        for faucet_box, faucet_center in zip(faucets, faucet_centers):
+            iou = umath.calculate_iou(pig_box, faucet_box)
+            dot = umath.calculate_dot_product(vector, (faucet_center[0] - pig_center[0], faucet_center[1] - pig_center[1]))
+            results.append((iou, dot))
+    return results
+
+
+def array_path(umath, pig_boxes, faucet_boxes, movement):
+    faucets = umath.resize_bboxes(160, faucet_boxes)
+    faucet_centers = umath.get_centers(faucets)
+    pig_centers = umath.get_centers(pig_boxes)
+    iou = umath.iou_matrix(pig_boxes, faucets)
+    dot = umath.dot_products(movement[:, None, :], faucet_centers[None, :, :] - pig_centers[:, None, :])
+    return iou, dot
+
+
+def check_equal(umath, pig_boxes, faucet_boxes, movement):
+    """Make sure both paths agree before timing them."""
+    scalar = np.array(scalar_path(umath, pig_boxes.tolist(), faucet_boxes.tolist(), movement.tolist()))
+    iou, dot = array_path(umath, pig_boxes, faucet_boxes, movement)
+    np.testing.assert_allclose(scalar[:, 0], iou.ravel(), rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(scalar[:, 1], dot.ravel(), rtol=1e-4, atol=1e-3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scalar and array geometry helpers.")
+    parser.add_argument("--pigs", type=int, default=20)
+    parser.add_argument("--faucets", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    umath = UMath()
+    pig_boxes = random_boxes(rng, args.pigs)
+    faucet_boxes = random_boxes(rng, args.faucets, size=(10, 30))
+    movement = rng.normal(0, 10, (args.pigs, 2)).astype(np.float32)
+
+    check_equal(umath, pig_boxes, faucet_boxes, movement)
+
+    # The scalar path works on Python lists, as the detections did before
+    pig_list, faucet_list, movement_list = pig_boxes.tolist(), faucet_boxes.tolist(), movement.tolist()
+    scalar = timeit.timeit(lambda: scalar_path(umath, pig_list, faucet_list, movement_list), number=args.repeat)
+    array = timeit.timeit(lambda: array_path(umath, pig_boxes, faucet_boxes, movement), number=args.repeat)
+
+    print(f"{args.pigs} pigs x {args.faucets} faucets, {args.repeat} repeats")
+    print(f"  scalar: {scalar / args.repeat * 1e6:8.1f} us/frame")
+    print(f"  array:  {array / args.repeat * 1e6:8.1f} us/frame")
+    print(f"  speedup: {scalar / array:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Throughput and memory benchmark of the processing pipeline on synthetic footage.
+
+Components:
+    detector  ModelHandler.get_detections on single frames
+    heatmap   Overlay.updateHeatmap with the pigs of each frame
+    flow      PigTracker + PigFlow + Draw.draw_lucas_kanade_flow
+    csv       CSVLogger.log_behavior and flush_if_due with the default buffering
+    pipeline  VideoProcessor.process_video on a synthetic clip, --analytics-only
+
+By default the models are replaced by the colour-threshold stubs in synthetic.py,
+so it runs on a CPU-only box without weights; --real-models uses the YOLO weights.
+Results can be saved as a baseline and later runs compared against it.
+
+Usage:
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+from synthetic import SyntheticPen, install_stub_models  # noqa: E402
+from ModelHandler import ModelHandler  # noqa: E402
+from Overlay import Overlay  # noqa: E402
+from Tracker import PigTracker  # noqa: E402
+from OpticalFlow import PigFlow  # noqa: E402
+from ComputerVision import Draw  # noqa: E402
+from CSV import CSVLogger  # noqa: E402
+from Config import load_config  # noqa: E402
+from pigParser import Parser  # noqa: E402
+from VideoProcessor import VideoProcessor  # noqa: E402
+
+COMPONENTS = ("detector", "heatmap", "flow", "csv", "pipeline")
+
+
+def sample_message(n):
+    """Behaviour event shaped like the ones VideoProcessor.start_event builds."""
+    return {
+        "start_frame": n * 100, "end_frame": n * 100 + 72, "behavior": "Drinking", "pig_id": n % 8 + 1,
+        "class": ["pig", "faucet1", "faucet2", "feces"], "confidence": [0.9, 0.95, 0.93, 0.6],
+        "coordinates": {"faucet1": (566, 92), "faucet2": (588, 315), "feces": (907, 606), "pig": (630, 100)},
+    }
+
+
+class Bench:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.frames = SyntheticPen(args.width, args.height, args.pigs, args.seed).frames(args.frames)
+        self.handler = ModelHandler(device=args.device)
+        # Detections are computed once for the components that do not benchmark the detector
+        detections = [self.handler.get_detections(frame) for frame in self.frames]
+        self.pigs = [self.handler.get_pig_detection(d).sorted_by_confidence() for d in detections]
+        self.clip = None
+
+    def detector(self):
+        for frame in self.frames:
+            self.handler.get_detections(frame)
+        return len(self.frames)
+
+    def heatmap(self):
+        overlay = Overlay(self.frames[0], self.args.heatmap_scale, self.args.heatmap_kernel)
+        for pigs in self.pigs:
+            overlay.updateHeatmap(pigs)
+        return len(self.frames)
+
+    def flow(self):
+        tracker, flow, draw = PigTracker(), PigFlow(), Draw()
+        for frame, pigs in zip(self.frames, self.pigs):
+            tracks = list(zip(tracker.update(pigs).tolist(), pigs))
+            tracker.update_flow(flow.update(frame, tracks))
+            draw.draw_lucas_kanade_flow(frame.copy(), flow.pairs, tracks)
+        return len(self.frames)
+
+    def csv(self):
+        count = self.args.frames * 10
+        with CSVLogger(self.workdir, "bench_csv.csv") as logger:
+            for n in range(count):
+                logger.log_behavior(sample_message(n))
+                logger.flush_if_due()
+        os.remove(os.path.join(self.workdir, "bench_csv.csv"))
+        return count
+
+    def pipeline(self):
+        if self.clip is None:
+            pen = SyntheticPen(self.args.width, self.args.height, self.args.pigs, self.args.seed)
+            self.clip = pen.write_clip(os.path.join(self.workdir, "clip.mp4"), self.args.clip_frames, fps=10)
+            config = dict(load_config(os.path.join(BENCH_DIR, "..", "src", "config.yaml")))
+            # Events go to a spool file in the work folder instead of the real broker
+            config["mqtt"] = {"host": "127.0.0.1", "port": 1, "user": "bench", "password": "bench",
+                              "spool_file": os.path.join(self.workdir, "mqtt_spool.jsonl")}
+            self.config = config
+            self.pipeline_args = Parser().parser.parse_args(
+                [self.clip, "--analytics-only", "--fps", "10", "--batch-size", str(self.args.batch_size)]
+                + (["--device", self.args.device] if self.args.device else []))
+
+        with CSVLogger(self.workdir, "bench_pipeline.csv") as logger:
+            VideoProcessor.process_video(self.clip, self.pipeline_args, logger, 0, self.config)
+        return self.args.clip_frames
+
+    def measure(self, name):
+        """Throughput (items per second, median of the repeats) and peak traced memory of a component."""
+        run = getattr(self, name)
+        run()  # Warm up caches, lazily loaded models and the clip
+
+        times = []
+        for _ in range(self.args.repeat):
+            start = time.perf_counter()
+            items = run()
+            times.append(time.perf_counter() - start)
+
+        # Memory in a separate run, tracing slows down the allocations
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        median = statistics.median(times)
+        return {
+            "items": items,
+            "median_s": median,
+            "throughput": items / median,
+            "peak_mb": peak / 1e6,
+        }
+
+
+def environment(args):
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "models": "real" if args.real_models else "stub",
+        "threads": args.threads,
+        "frames": args.frames,
+        "resolution": f"{args.width}x{args.height}",
+        "pigs": args.pigs,
+        "seed": args.seed,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change per component and return the regressions beyond threshold."""
+    regressions = []
+    if baseline["environment"] != results["environment"]:
+        print("Warning: the baseline was recorded with a different environment or settings")
+    for name, result in results["components"].items():
+        base = baseline["components"].get(name)
+        if base is None:
+            continue
+        speed = result["throughput"] / base["throughput"] - 1.0
+        memory = result["peak_mb"] / base["peak_mb"] - 1.0 if base["peak_mb"] > 0 else 0.0
+        print(f"  {name:<9} throughput {speed:+7.1%}   peak memory {memory:+7.1%}")
+        if speed < -threshold:
+            regressions.append(f"{name}: throughput {speed:+.1%}")
+        # Ignore memory noise below one megabyte
+        if memory > threshold and result["peak_mb"] - base["peak_mb"] > 1.0:
+            regressions.append(f"{name}: peak memory {memory:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline components on synthetic footage.")
+    parser.add_argument("--components", nargs="+", choices=COMPONENTS, default=list(COMPONENTS))
+    parser.add_argument("--frames", type=int, default=30, help="Synthetic frames kept in memory per component run.")
+    parser.add_argument("--clip-frames", type=int, default=100, help="Frames of the clip processed by the pipeline component.")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--pigs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1, help="OpenCV threads, fixed so runs are comparable.")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--heatmap-scale", type=int, default=1)
+    parser.add_argument("--heatmap-kernel", choices=["box", "gaussian"], default="box")
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--real-models", action="store_true", help="Use the YOLO weights instead of the stub models.")
+    parser.add_argument("--output", type=str, default=None, help="Write the results of this run to a JSON file.")
+    parser.add_argument("--save-baseline", type=str, default=None, help="Write the results as the new baseline JSON file.")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against this baseline JSON file.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown or memory growth counted as a regression.")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(args.threads)
+    if not args.real_models:
+        install_stub_models(args.device)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bench = Bench(args, workdir)
+        results = {"environment": environment(args), "components": {}}
+        for name in args.components:
+            result = bench.measure(name)
+            results["components"][name] = result
+            print(f"{name:<9} {result['throughput']:10.1f} items/s   {result['median_s'] * 1000:9.1f} ms/run   "
+                  f"peak {result['peak_mb']:8.1f} MB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f"Compared with {args.baseline}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions beyond {:.0%}:\n  ".format(args.threshold) + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Synthetic pen footage and stub YOLO models for the benchmarks.
+
+Pigs are drawn as pink ellipses that wander around a dark pen with two red faucets,
+so the stub detector can find them again with a colour threshold. Everything is seeded,
+so the same arguments always give the same frames and detections.
+"""
+import os
+
+import cv2
+import numpy as np
+
+# BGR colours the stub detector looks for
+PIG_COLOR = (180, 170, 230)
+FAUCET_COLOR = (0, 0, 255)
+FECES_COLOR = (20, 60, 90)
+
+DETECTOR_NAMES = {0: "Pig-laying", 1: "Pig-standing", 2: "Water-faucets", 3: "feces"}
+BEHAVIOR_NAMES = {0: "Drinking", 1: "Idle"}
+
+
+class SyntheticPen:
+    def __init__(self, width=1280, height=720, pigs=8, seed=0):
+        """
+        Args:
+            width (int): Frame width.
+            height (int): Frame height.
+            pigs (int): Number of pigs walking around.
+            seed (int): Seed of the random walk and the sensor noise.
+        """
+        self.width, self.height = width, height
+        self.rng = np.random.default_rng(seed)
+        self.faucets = np.array([[559, 80, 573, 104], [583, 305, 593, 325]], dtype=np.int32)
+        self.centers = self.rng.uniform([100, 100], [width - 100, height - 100], (pigs, 2))
+        self.velocity = self.rng.normal(0, 4, (pigs, 2))
+        self.sizes = self.rng.uniform([50, 25], [80, 40], (pigs, 2))  # Half axes of each pig
+        self.background = np.full((height, width, 3), 60, dtype=np.uint8)
+        cv2.randn(self.background, 60, 8)
+
+    def frame(self):
+        """Next frame: every pig takes one step of its random walk, some pigs head for a faucet."""
+        self.velocity = 0.9 * self.velocity + self.rng.normal(0, 1.5, self.velocity.shape)
+        # The first pigs are pulled towards the faucets so there is drinking to detect
+        faucet_centers = (self.faucets[:, :2] + self.faucets[:, 2:]) / 2.0
+        for n in range(min(2, len(self.centers))):
+            self.velocity[n] += 0.02 * (faucet_centers[n] + [60, 0] - self.centers[n])
+        self.centers = np.clip(self.centers + self.velocity, [80, 50], [self.width - 80, self.height - 50])
+
+        img = self.background.copy()
+        cv2.rectangle(img, (900, 600), (915, 612), FECES_COLOR, -1)
+        for x_min, y_min, x_max, y_max in self.faucets.tolist():
+            cv2.rectangle(img, (x_min, y_min), (x_max, y_max), FAUCET_COLOR, -1)
+        for (cx, cy), (ax, ay), (vx, vy) in zip(self.centers, self.sizes, self.velocity):
+            angle = float(np.degrees(np.arctan2(vy, vx)))
+            cv2.ellipse(img, (int(cx), int(cy)), (int(ax), int(ay)), angle, 0, 360, PIG_COLOR, -1)
+        return img
+
+    def frames(self, count):
+        return [self.frame() for _ in range(count)]
+
+    def write_clip(self, path, count, fps=10):
+        """Write count frames to a video file that FrameHandler can read."""
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (self.width, self.height))
+        if not writer.isOpened():
+            raise RuntimeError(f"Could not open a video writer for {path}")
+        for _ in range(count):
+            writer.write(self.frame())
+        writer.release()
+        return path
+
+
+class _Array:
+    """Numpy array with the .cpu().numpy() calls of a torch tensor."""
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, class_ids, boxes, confidences):
+        self.cls = _Array(np.asarray(class_ids, dtype=np.float32))
+        self.xyxy = _Array(np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+        self.conf = _Array(np.asarray(confidences, dtype=np.float32))
+
+
+class _Result:
+    def __init__(self, class_ids, boxes, confidences):
+        self.boxes = _Boxes(class_ids, boxes, confidences)
+
+
+def _blobs(img, color, tolerance=12, min_area=20):
+    """Bounding boxes of the connected regions drawn in a colour."""
+    color = np.array(color, dtype=np.int16)
+    mask = cv2.inRange(img, np.clip(color - tolerance, 0, 255).astype(np.uint8), np.clip(color + tolerance, 0, 255).astype(np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    stats = stats[1:count]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= min_area]
+    x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+    return np.stack([x, y, x + stats[:, cv2.CC_STAT_WIDTH], y + stats[:, cv2.CC_STAT_HEIGHT]], axis=1).astype(np.float32)
+
+
+class StubDetector:
+    """Stand-in for the pig detector: finds the synthetic pigs, faucets and feces by colour."""
+    names = DETECTOR_NAMES
+
+    def _detect(self, img):
+        pigs = _blobs(img, PIG_COLOR, min_area=200)
+        faucets = _blobs(img, FAUCET_COLOR)
+        feces = _blobs(img, FECES_COLOR)
+        # Wide pigs are standing, round ones are laying
+        aspect = (pigs[:, 2] - pigs[:, 0]) / np.maximum(1.0, pigs[:, 3] - pigs[:, 1])
+        class_ids = np.concatenate([np.where(aspect > 1.3, 1, 0), np.full(len(faucets), 2), np.full(len(feces), 3)])
+        boxes = np.concatenate([pigs, faucets, feces])
+        confidences = np.concatenate([np.full(len(pigs), 0.9), np.full(len(faucets), 0.95), np.full(len(feces), 0.6)])
+        return _Result(class_ids, boxes, confidences)
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        return [self._detect(img) for img in images]
+
+
+class StubBehavior:
+    """Stand-in for the behaviour model: alternates between confident Drinking and Idle."""
+    names = BEHAVIOR_NAMES
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        results = []
+        for img in images:
+            self.calls += 1
+            height, width = img.shape[:2]
+            class_id = 0 if self.calls % 2 else 1
+            results.append(_Result([class_id], [[0, 0, width, height]], [0.9]))
+        return results
+
+
+def install_stub_models(device=None):
+    """Put the stub models in the ModelHandler registry so no weights are loaded."""
+    from ModelHandler import ModelHandler, DETECTOR_MODEL, BEHAVIOR_MODEL
+    ModelHandler._models[(os.path.abspath(DETECTOR_MODEL), device)] = StubDetector()
+    ModelHandler._models[(os.path.abspath(BEHAVIOR_MODEL), device)] = StubBehavior()
@@ -0,0 +1,77 @@
+import os
+import json
+import datetime
+
+# Fixed frame rate used for the times, the same as the CSV output
+FPS = 24.0
+VERSION = 1
+
+
+def aggregate_filename(fullday_filename):
+    """Aggregate store kept next to a full-day CSV: fullday.csv -> fullday_aggregates.json."""
+    return f"{os.path.splitext(fullday_filename)[0]}_aggregates.json"
+
+
+class AggregateStore:
+    def __init__(self, filename, pen=None):
+        """
+        Running totals of the behaviours of one pen, updated with every full-day flush so
+        dashboards and BehaviourGraph never have to re-read fullday.csv.
+
+        Holds per behaviour: the event count, per hour-of-day and per minute-of-day counts, and per day
+        the counts and drinking seconds; plus the total drinking seconds. Stored as compact JSON.
+
+        Args:
+            filename (str): JSON file of the store. Loaded if it exists, so totals keep growing across runs.
+            pen (str): Pen name. Defaults to the output folder name without "-Data".
+        """
+        self.filename = filename
+        if os.path.exists(filename):
+            with open(filename, 'r') as file:
+                self.data = json.load(file)
+        else:
+            if pen is None:
+                pen = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+                pen = pen[:-len("-Data")] if pen.endswith("-Data") else pen
+            self.data = {"version": VERSION, "pen": pen, "counts": {}, "drinking_seconds": 0.0,
+                         "hourly": {}, "minutely": {}, "daily": {}}
+
+    def add(self, behavior, start_frame, duration, start_time):
+        """
+        Count one event.
+
+        Args:
+            behavior (str): Behaviour of the event.
+            start_frame (int): First frame of the event in its video.
+            duration (float): Duration of the event in seconds.
+            start_time (datetime): Wall clock time of frame 0 of the video.
+        """
+        data = self.data
+        when = start_time + datetime.timedelta(seconds=start_frame / FPS)
+        day = data["daily"].setdefault(when.date().isoformat(), {"counts": {}, "drinking_seconds": 0.0})
+
+        data["counts"][behavior] = data["counts"].get(behavior, 0) + 1
+        day["counts"][behavior] = day["counts"].get(behavior, 0) + 1
+        data["hourly"].setdefault(behavior, [0] * 24)[when.hour] += 1
+        data["minutely"].setdefault(behavior, [0] * 1440)[when.hour * 60 + when.minute] += 1
+        if behavior == "Drinking":
+            data["drinking_seconds"] += duration
+            day["drinking_seconds"] += duration
+
+    def add_rows(self, rows, start_time):
+        """Count CSV rows (see CSV.HEADER) logged from a video that started at start_time."""
+        for row in rows:
+            self.add(row[4], row[0], row[5], start_time)
+
+    def save(self):
+        """Write the store, replacing the file atomically so dashboards never read half a file."""
+        tmp_file = f"{self.filename}.tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump(self.data, file, separators=(",", ":"))
+        os.replace(tmp_file, self.filename)
+
+    @staticmethod
+    def load(filename):
+        """Read a saved store as a dict."""
+        with open(filename, 'r') as file:
+            return json.load(file)
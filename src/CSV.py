@@ -1,56 +1,148 @@
 import os
 import csv
+import time
+import atexit
+import signal
+import sys
+import weakref
+import datetime
+from Print import Print
+from Aggregates import AggregateStore, aggregate_filename
+
+HEADER = ["Start-frame", "End-Frame", "start-time-min", "end-time-min", "Behavior", "Drinking-Duration",
+          "Pig-Center",  "Pig-Conf","Faucet-1-Center", "Faucet-1-conf", "Faucet-2-Center", "Faucet-2-conf",
+          "Feces-Center", "Feces-conf", "Pig-ID"]
+
+# Loggers with open files, flushed on interpreter exit and on SIGTERM
+_open_loggers = weakref.WeakSet()
+
+
+def ensure_csv_header(filename):
+    """Create the CSV file with the header, or reset it if its first line is not the expected header."""
+    if not os.path.exists(filename):
+        # Initialize the file if it doesn't exist
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+        Print.print_info(f"CSV initialized at: {filename}")
+        return
+
+    # Check if it already has the header
+    with open(filename, mode='r') as file:
+        first_line = file.readline()
+    if first_line.strip() != ",".join(HEADER):
+        # Keep rows written with an older header instead of overwriting them
+        if first_line.strip():
+            backup = f"{filename}.{int(time.time())}.bak"
+            os.replace(filename, backup)
+            Print.print_info(f"CSV with a different header moved to: {backup}")
+        # If no header or different header, write the header
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+        Print.print_info(f"CSV header initialized or reset at: {filename}")
+
+
+def _flush_open_loggers():
+    for logger in list(_open_loggers):
+        logger.close()
+
+
+def _handle_termination(signum, frame):
+    # Exit normally so atexit flushes the buffered rows
+    sys.exit(128 + signum)
+
+
+atexit.register(_flush_open_loggers)
+
 
 class CSVLogger:
-    def __init__(self, output_folder, filename, log_full_day=False):
+    def __init__(self, output_folder, filename, log_full_day=False, fullday_queue=None,
+                 flush_rows=50, flush_interval=30.0, fsync=False):
+        """
+        Args:
+            output_folder (str): Folder the CSV files are written to.
+            filename (str): Name of the per-video CSV file.
+            log_full_day (bool): Also log every behaviour to fullday.csv in the same folder.
+            fullday_queue: Optional queue. When set, full-day rows are sent to it as
+                           (fullday_filename, rows) instead of being appended here, so a single
+                           FullDayWriter owns fullday.csv when several processes log at once.
+                           The owner of fullday.csv also keeps its aggregate store up to date.
+            flush_rows (int): Write the buffered rows on the next flush_if_due() once this many are waiting.
+            flush_interval (float): Write the buffered rows when the oldest has waited this many seconds.
+            fsync (bool): fsync the files on every flush so the outputs survive a crash.
+        """
         self.filename = os.path.join(output_folder, filename)  # Ensure full path
+        self.fullday_queue = fullday_queue
         self.init = True
         self.inBehavior = False
         self.loggerMessage = {}
-        
+
         # If the flag is set, also log to full day CSV
         self.log_full_day = log_full_day
         self.fullday_initialized = False  # Track whether full-day CSV is initialized
-        
+
         if self.log_full_day:
             # Set the path for the full-day CSV
             self.fullday_filename = os.path.join(output_folder, "fullday.csv")
 
+        # Buffered writer state; files are opened on the first logged behaviour and kept open
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rows = []
+        self.first_buffered_at = None
+        self.flush_pending = False  # flush_rows rows are waiting, written on the next flush_if_due()
+        self.file = None
+        self.fullday_file = None
+        self.sinks = []  # Additional outputs (e.g. ParquetLogger) receiving the same events
+        self.aggregates = None  # Aggregate store of fullday.csv, loaded when the files are opened
+        self.start_time = datetime.datetime.now()  # Wall clock time of frame 0, used for the time bins
+        self.on_flush = None  # Called after buffered rows are written, e.g. to save a checkpoint
+        _open_loggers.add(self)
+
+    def add_sink(self, sink):
+        """
+        Also send every logged behaviour to sink.log_behavior(). The sink is closed with this logger, and its
+        checkpoint() state is saved and passed back to restore() when a video resumes (see output_offsets()).
+        """
+        self.sinks.append(sink)
+
+    @staticmethod
+    def install_signal_handlers():
+        """Flush every open logger when the process is terminated. Must be called from the main thread."""
+        signal.signal(signal.SIGTERM, _handle_termination)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
     def initialize_csv(self, classes, is_full_day=False):
         """Create or reset the CSV file with headers, only if the file doesn't exist."""
         try:
-            # Define the columns for the individual video CSV
-            header = ["Start-frame", "End-Frame", "start-time-min", "end-time-min", "Behavior", "Drinking-Duration",
-                      "Pig-Center",  "Pig-Conf","Faucet-1-Center", "Faucet-1-conf", "Faucet-2-Center", "Faucet-2-conf", 
-                      "Feces-Center", "Feces-conf"]
-            
             # Choose the appropriate filename
             filename = self.fullday_filename if is_full_day else self.filename
-
-            # Check if the file exists and if it contains the header
-            if not os.path.exists(filename):
-                # Initialize the file if it doesn't exist
-                with open(filename, mode='w', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(header)
-                print(f"CSV initialized at: {filename}")
-            else:
-                # Check if it already has the header
-                with open(filename, mode='r') as file:
-                    first_line = file.readline()
-                    if first_line.strip() != ",".join(header):
-                        # If no header or different header, write the header
-                        with open(filename, mode='w', newline='') as file:
-                            writer = csv.writer(file)
-                            writer.writerow(header)
-                        print(f"CSV header initialized or reset at: {filename}")
+            ensure_csv_header(filename)
 
             # Initialize only if the full-day file hasn't been initialized yet
             if is_full_day and not self.fullday_initialized:
                 self.fullday_initialized = True  # Mark full-day CSV as initialized
 
         except Exception as e:
-            print(f"Error initializing CSV: {e}")
+            Print.print_error(f"Error initializing CSV: {e}")
+
+    def open(self):
+        """Check the headers once and open the output files for appending."""
+        self.initialize_csv([])
+        self.file = open(self.filename, mode='a', newline='')
+        if self.log_full_day and self.fullday_queue is None:
+            self.initialize_csv([], is_full_day=True)
+            self.fullday_file = open(self.fullday_filename, mode='a', newline='')
+            self.aggregates = AggregateStore(aggregate_filename(self.fullday_filename))
+        self.init = False
 
     def log_behavior(self, loggerMessage):
         """Log the behavior details from a loggerMessage to the CSV file."""
@@ -61,12 +153,19 @@ class CSVLogger:
         confidences = loggerMessage.get("confidence", [])
         coordinates = loggerMessage.get("coordinates", {})  # Added for faucet/feces centers
 
+        for sink in self.sinks:
+            try:
+                sink.log_behavior(loggerMessage)
+            except Exception as e:
+                Print.print_error(f"Error logging behavior to {type(sink).__name__}: {e}")
+
         # If the CSV file hasn't been initialized yet, initialize it
         if self.init:
-            self.initialize_csv(classes)
-            if self.log_full_day:
-                self.initialize_csv(classes, is_full_day=True)
-            self.init = False
+            try:
+                self.open()
+            except Exception as e:
+                Print.print_error(f"Error initializing CSV: {e}")
+                return
 
         # Default empty values for each class
         pig_conf = ""
@@ -91,31 +190,153 @@ class CSVLogger:
                 feces_conf = confidences[3]
 
         # Calculate the drinking duration in minutes (assuming 24 FPS)
-        
+
         drinking_duration = (end_frame - start_frame) / 24.0   # Duration in minutes
 
         # Calculate the start time in minutes (start_frame / 24 FPS)
         start_time_minutes = start_frame / 24.0 / 60.0
         end_time_minutes = end_frame / 24.0 / 60.0
 
+        # Buffer the row with separated values for each class; it is written on the next flush
+        self.rows.append([start_frame, end_frame, start_time_minutes, end_time_minutes, behavior,  drinking_duration, pig_coord, pig_conf] +
+                         [faucet1_coord, faucet1_conf,
+                         faucet2_coord, faucet2_conf, feces_coord, feces_conf, loggerMessage.get("pig_id", "")])
+        if self.first_buffered_at is None:
+            self.first_buffered_at = time.monotonic()
+        Print.print_debug(f"Logged behavior at frame {start_frame} to CSV.")
+
+        # Only buffer here: a flush saves a checkpoint through on_flush, which must not happen while
+        # the caller is still in the middle of a frame
+        if len(self.rows) >= self.flush_rows:
+            self.flush_pending = True
+
+    def flush_if_due(self):
+        """
+        Flush if flush_rows rows are waiting or the oldest buffered row has waited longer than flush_interval.
+        Cheap enough to call every frame, once the frame is complete.
+        """
+        if self.flush_pending or (self.first_buffered_at is not None
+                                  and time.monotonic() - self.first_buffered_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows to the per-video CSV and then to the full-day CSV."""
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        self.first_buffered_at = None
+        self.flush_pending = False
 
-        # Write the behavior to the individual video CSV with separated values for each class
         try:
-            with open(self.filename, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([start_frame, end_frame, start_time_minutes, end_time_minutes, behavior,  drinking_duration, pig_coord, pig_conf] + 
-                                [faucet1_coord, faucet1_conf, 
-                                faucet2_coord, faucet2_conf, feces_coord, feces_conf])
-            print(f"Logged behavior at frame {start_frame} to CSV.")
-            
+            csv.writer(self.file).writerows(rows)
+            self._sync(self.file)
+
             # If logging full day, also append to the full-day CSV
             if self.log_full_day:
-                with open(self.fullday_filename, mode='a', newline='') as full_file:
-                    writer = csv.writer(full_file)
-                    writer.writerow([start_frame, end_frame, start_time_minutes, end_time_minutes, behavior, drinking_duration, pig_coord, pig_conf] + 
-                                    [faucet1_coord, faucet1_conf, 
-                                    faucet2_coord, faucet2_conf, feces_coord, feces_conf])
-                print(f"Logged behavior at frame {start_frame} to Full-day CSV.")
+                if self.fullday_queue is not None:
+                    # Another process owns fullday.csv, hand the rows over to it
+                    self.fullday_queue.put((self.fullday_filename, rows, self.start_time))
+                else:
+                    csv.writer(self.fullday_file).writerows(rows)
+                    self._sync(self.fullday_file)
+                    self.aggregates.add_rows(rows, self.start_time)
+                    self.aggregates.save()
+                Print.print_debug(f"Logged {len(rows)} behaviors to Full-day CSV.")
 
         except Exception as e:
-            print(f"Error logging behavior: {e}")
+            Print.print_error(f"Error logging behavior: {e}")
+            return
+
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def output_offsets(self):
+        """
+        Size of the CSV files with every row written so far, and the state of every sink, for a checkpoint.
+        The full-day offset is None when another process owns fullday.csv. The aggregate store is not part
+        of the checkpoint: rows flushed between its last save and a crash can be counted again on resume.
+        """
+        def size(file, filename):
+            if file is not None:
+                return file.tell()
+            return os.path.getsize(filename) if os.path.exists(filename) else 0
+
+        offsets = {"csv": size(self.file, self.filename), "fullday": None}
+        if self.log_full_day and self.fullday_queue is None:
+            offsets["fullday"] = size(self.fullday_file, self.fullday_filename)
+        offsets["sinks"] = [sink.checkpoint() for sink in self.sinks]
+        return offsets
+
+    def truncate_outputs(self, offsets):
+        """Cut the CSV files and sinks back to the offsets of a checkpoint, dropping rows written after it."""
+        targets = [(self.filename, offsets.get("csv"))]
+        if self.log_full_day and self.fullday_queue is None:
+            targets.append((self.fullday_filename, offsets.get("fullday")))
+        for filename, offset in targets:
+            if offset is not None and os.path.exists(filename) and os.path.getsize(filename) > offset:
+                with open(filename, 'r+') as file:
+                    file.truncate(offset)
+        # Sinks are attached in the same order on every run
+        for sink, state in zip(self.sinks, offsets.get("sinks", [])):
+            sink.restore(state)
+
+    def _sync(self, file):
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def close(self):
+        """Flush the remaining rows and close the output files."""
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+        if self.fullday_file is not None:
+            self.fullday_file.close()
+            self.fullday_file = None
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+        self.init = True
+        _open_loggers.discard(self)
+
+
+class FullDayWriter:
+    """
+    Single owner of the full-day CSV files when videos are processed by several worker processes.
+    Workers put (fullday_filename, rows, start_time) items on the queue; rows are appended in arrival
+    order so concurrent appends can never interleave, and counted in the aggregate store of the file.
+    """
+    def __init__(self, row_queue, fsync=False):
+        self.row_queue = row_queue
+        self.fsync = fsync
+        self.files = {}  # Open full-day files by filename
+        self.aggregates = {}  # Aggregate store by full-day filename
+
+    def run(self):
+        """Append queued rows until a None sentinel is received."""
+        try:
+            while True:
+                item = self.row_queue.get()
+                if item is None:
+                    break
+                filename, rows, start_time = item
+
+                try:
+                    if filename not in self.files:
+                        ensure_csv_header(filename)
+                        self.files[filename] = open(filename, mode='a', newline='')
+                        self.aggregates[filename] = AggregateStore(aggregate_filename(filename))
+                    file = self.files[filename]
+                    csv.writer(file).writerows(rows)
+                    file.flush()
+                    if self.fsync:
+                        os.fsync(file.fileno())
+                    self.aggregates[filename].add_rows(rows, start_time)
+                    self.aggregates[filename].save()
+                except Exception as e:
+                    Print.print_error(f"Error logging behavior: {e}")
+        finally:
+            for file in self.files.values():
+                file.close()
+            self.files = {}
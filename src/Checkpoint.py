@@ -0,0 +1,59 @@
+import os
+import json
+
+
+class RunManifest:
+    def __init__(self, output_folder):
+        """
+        Progress of the videos written to one output folder, so a restarted run can skip finished
+        videos and resume the others. Every video has its own entry file in <output_folder>/checkpoints,
+        so worker processes never write the same file.
+
+        Args:
+            output_folder (str): Output folder of the videos (e.g. Pen-Data).
+        """
+        self.folder = os.path.join(output_folder, "checkpoints")
+
+    def _path(self, video_path):
+        return os.path.join(self.folder, f"{os.path.basename(video_path)}.json")
+
+    @staticmethod
+    def _identity(video_path):
+        """Size and modification time, so a replaced video is not resumed from a stale entry."""
+        stat = os.stat(video_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def load(self, video_path):
+        """
+        Entry of a video, or None if there is none or the video file has changed since.
+
+        Returns:
+            dict: {"status": "running" or "done", "last_frame": ..., plus the state saved by the processor}.
+        """
+        try:
+            with open(self._path(video_path), 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if entry.get("identity") != self._identity(video_path):
+            return None
+        return entry
+
+    def is_done(self, video_path):
+        entry = self.load(video_path)
+        return entry is not None and entry.get("status") == "done"
+
+    def save(self, video_path, entry):
+        """Write the entry of a video, replacing the file atomically so a crash never leaves half an entry."""
+        os.makedirs(self.folder, exist_ok=True)
+        entry = dict(entry, video=os.path.abspath(video_path), identity=self._identity(video_path))
+        path = self._path(video_path)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'w') as file:
+            # Numpy scalars (e.g. confidences) are written as plain numbers
+            json.dump(entry, file, default=lambda value: value.item())
+        os.replace(tmp_file, path)
+
+    def mark_done(self, video_path):
+        """Record that every frame of the video has been processed and its rows are written."""
+        self.save(video_path, {"status": "done"})
@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from Detections import Detections
 
 class Draw:
     def __init__(self):
@@ -81,16 +82,20 @@ class Draw:
         
         Args:
             img (ndarray): The image to draw on.
-            detections (list): A list of detections where each detection is a tuple (class_name, bbox, confidence).
+            detections (Detections or list): Detections, or a list of (class_name, bbox, confidence) tuples.
             behavior (str): Optional string describing the object's behavior (e.g., "Drinking").
         
         Returns:
             img (ndarray): The image with bounding boxes drawn.
         """
-        for detection in detections:  # Iterate over all detections
-            class_name, bbox, conf = detection  # Unpack the detection tuple
+        if isinstance(detections, Detections):
+            # Convert the whole box array to integers at once
+            rows = zip(detections.class_names(), detections.boxes.astype(np.int32).tolist(), detections.confidences.tolist())
+        else:
+            rows = ((class_name, list(map(int, bbox)), conf) for class_name, bbox, conf in detections)
+
+        for class_name, (x1, y1, x2, y2), conf in rows:  # Iterate over all detections
             color = self.colors[class_name] 
-            x1, y1, x2, y2 = map(int, bbox)  # Convert bounding box coordinates to integers
 
             # Draw bounding box
             cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
@@ -111,66 +116,28 @@ class Draw:
                     )
         
         return img
-    def draw_lucas_kanade_flow(self, img, prev_img, detections):
+    def draw_lucas_kanade_flow(self, img, flow_pairs, tracks):
         """
-        Draws Lucas-Kanade optical flow for detected pigs with reduced arrow density.
+        Draws the Lucas-Kanade optical flow computed by PigFlow for the tracked pigs.
 
         Args:
             img (ndarray): Current frame image.
-            prev_img (ndarray): Previous frame image for optical flow calculation.
-            detections (list): List of pig detections where each detection is a tuple (class_name, bbox, confidence).
+            flow_pairs (dict): Track id -> (old points, new points), see PigFlow.pairs.
+            tracks (list): (track id, pig detection) pairs of the current frame.
 
         Returns:
-            ndarray: Image with smoother optical flow vectors drawn.
+            ndarray: Image with the optical flow vectors drawn.
         """
-        # Convert images to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        prev_gray = cv2.cvtColor(prev_img, cv2.COLOR_BGR2GRAY)
-
-        # Parameters for Lucas-Kanade optical flow, adjusted for smoother results
-        lk_params = dict(winSize=(21, 21), maxLevel=2, 
-                         criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
-        feature_params = dict(maxCorners=30, qualityLevel=0.3, minDistance=15, blockSize=7)  # Fewer points, more spread out
-
-        # Only process 'Pig-standing' for now, assuming these are moving
-        pigs = [detection for detection in detections if detection[0] == "Pig-standing"]
-
-        for pig in pigs:
-            bbox = pig[1]
-            x1, y1, x2, y2 = map(int, bbox)
-            pig_center = ((x1 + x2) // 2, (y1 + y2) // 2)
-
-            # Define ROI for optical flow around the pig
-            roi_padding = 75
-            x1_roi, y1_roi = max(0, pig_center[0] - roi_padding), max(0, pig_center[1] - roi_padding)
-            x2_roi, y2_roi = min(img.shape[1], pig_center[0] + roi_padding), min(img.shape[0], pig_center[1] + roi_padding)
-
-            # Get ROI in grayscale
-            roi_gray = gray[y1_roi:y2_roi, x1_roi:x2_roi]
-            prev_roi_gray = prev_gray[y1_roi:y2_roi, x1_roi:x2_roi]
-
-            # Find corners in the ROI for tracking with fewer, better quality points
-            p0 = cv2.goodFeaturesToTrack(roi_gray, mask=None, **feature_params)
-
-            if p0 is not None and len(p0) > 0:
-                p0 = np.float32(p0).reshape(-1, 1, 2)
-                p0[:, :, 0] += x1_roi  # Adjust coordinates to full image space
-                p0[:, :, 1] += y1_roi
-
-                # Calculate optical flow
-                p1, st, err = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **lk_params)
-
-                # Select good points and apply some smoothing
-                good_new = p1[st == 1]
-                good_old = p0[st == 1]
-
-                # Draw optical flow tracks with reduced density
-                for i, (new, old) in enumerate(zip(good_new, good_old)):
-                    a, b = new.ravel()
-                    c, d = old.ravel()
-                    # Scale down the vector length for visualization
-                    scale = 0.5
-                    vector_end = (int(a + (a - c) * scale), int(b + (b - d) * scale))
-                    cv2.arrowedLine(img, (int(a), int(b)), vector_end, self.colors["vector"], 1)
+        # Only draw 'Pig-standing' for now, assuming these are moving
+        for track_id, pig in tracks:
+            if pig[0] != "Pig-standing" or track_id not in flow_pairs:
+                continue
+
+            good_old, good_new = flow_pairs[track_id]
+            for (a, b), (c, d) in zip(good_new.tolist(), good_old.tolist()):
+                # Scale down the vector length for visualization
+                scale = 0.5
+                vector_end = (int(a + (a - c) * scale), int(b + (b - d) * scale))
+                cv2.arrowedLine(img, (int(a), int(b)), vector_end, self.colors["vector"], 1)
 
         return img
\ No newline at end of file
@@ -0,0 +1,59 @@
+import yaml
+from types import MappingProxyType
+
+CONFIG_PATH = "src/config.yaml"
+
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def load_config(config_path=CONFIG_PATH):
+    """
+    Load the YAML configuration once and return a read-only view of it.
+
+    Args:
+        config_path (str): Path to the configuration YAML file.
+
+    Returns:
+        Mapping: The configuration; nested sections are read-only mappings as well.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Error: Config file not found at {config_path}.")
+    return _freeze(config)
+
+
+class PredictionLog:
+    def __init__(self, output_file):
+        """
+        In-memory record of which segments had drinking detected (confusion 'predicted' values).
+        Written to its own YAML file at the end of every segment instead of into config.yaml.
+
+        Args:
+            output_file (str): YAML file the predictions of this run are written to.
+        """
+        self.output_file = output_file
+        self.predicted = []
+
+    def start_segment(self):
+        # Append a new segment (0) to y_pred at the start of each video or segment
+        self.predicted.append(0)
+
+    def mark_drinking(self):
+        # Update the last entry in y_pred to 1 if drinking detected
+        if not self.predicted:
+            self.start_segment()
+        self.predicted[-1] = 1
+
+    def end_segment(self):
+        """Write the predictions of this run to the output file."""
+        with open(self.output_file, 'w') as file:
+            yaml.dump({'confusion': {'predicted': self.predicted}}, file)
@@ -0,0 +1,222 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import numpy as np
+from Detections import Detections
+
+VERSION = 1
+# Bytes hashed at the start, middle and end of a video; hashing whole recordings would take minutes
+SAMPLE_SIZE = 1 << 20
+# Settings holding weight file hashes, None when the weights are not on this machine
+MODEL_KEYS = ("detector", "behavior")
+ARRAYS = ("frames", "reuse", "det_start", "det_class", "det_box", "det_conf",
+          "flow_start", "flow", "beh_start", "beh_owner", "beh_class", "beh_box", "beh_conf")
+
+
+def video_hash(video_path):
+    """Content hash of a video from its size and three samples of SAMPLE_SIZE bytes."""
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(video_path, 'rb') as file:
+        for offset in sorted({0, max(0, size // 2 - SAMPLE_SIZE // 2), max(0, size - SAMPLE_SIZE)}):
+            file.seek(offset)
+            digest.update(file.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def model_hash(model_path):
+    """Hash of a weights file, or None if the file is not on disk."""
+    if not os.path.exists(model_path):
+        return None
+    digest = hashlib.sha1()
+    with open(model_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(SAMPLE_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_settings(args):
+    """Settings that change what the models output, so they are part of the model key."""
+    from ModelHandler import DETECTOR_MODEL, BEHAVIOR_MODEL
+    return {
+        "detector": model_hash(DETECTOR_MODEL),
+        "behavior": model_hash(BEHAVIOR_MODEL),
+        "behavior_crop": bool(args.behavior_crop),
+        "behavior_imgsz": args.behavior_imgsz if args.behavior_crop else None,
+        "faucet_roi": args.faucet_roi,
+        "roi_stable_frames": args.roi_stable_frames if args.faucet_roi else None,
+        "roi_tile_size": args.roi_tile_size if args.faucet_roi else None,
+    }
+
+
+def cache_folder(cache_dir, video_path, args):
+    """Folder of the cache of one video for one set of models: <cache_dir>/<video hash>-<model hash>."""
+    settings = json.dumps(cache_settings(args), sort_keys=True).encode()
+    return os.path.join(cache_dir, f"{video_hash(video_path)[:16]}-{hashlib.sha1(settings).hexdigest()[:16]}")
+
+
+def find_cache(cache_dir, video_path, args):
+    """
+    Cache folder to replay a video from. The model hashes are only compared for the weight files that are
+    on this machine, so caches can be replayed where the models are not installed. If several caches
+    match, the newest one is used.
+
+    Returns:
+        str: The cache folder, or None if there is no matching cache.
+    """
+    expected = {key: value for key, value in cache_settings(args).items() if key not in MODEL_KEYS or value is not None}
+    matches = []
+    for folder in glob.glob(os.path.join(glob.escape(cache_dir), f"{video_hash(video_path)[:16]}-*")):
+        if not DetectionCache.exists(folder):
+            continue
+        with open(os.path.join(folder, "meta.json"), 'r') as file:
+            settings = json.load(file).get("settings", {})
+        if all(settings.get(key) == value for key, value in expected.items()):
+            matches.append(folder)
+    return max(matches, key=os.path.getmtime) if matches else None
+
+
+class CachedFrame:
+    def __init__(self, detections, flow, behavior):
+        """
+        Model outputs of one processed frame, as recorded by DetectionCacheWriter.
+
+        Args:
+            detections (Detections): Detector output.
+            flow (ndarray): (P, 2) optical flow of the pigs in confidence order, NaN where there was none.
+            behavior (dict): Behaviour model output per pig index, or under None for the full frame.
+        """
+        self.detections = detections
+        self.flow = flow
+        self.behavior = behavior
+
+    def flow_vectors(self, tracks):
+        """Flow per track id in the format of PigFlow.update(), for the (track id, pig) pairs of this frame."""
+        return {track_id: (float(dx), float(dy)) for (track_id, _), (dx, dy) in zip(tracks, self.flow.tolist())
+                if dx == dx}  # NaN marks pigs without flow
+
+
+class DetectionCacheWriter:
+    def __init__(self, folder, meta):
+        """
+        Collect the model outputs of every processed frame and write them as flat arrays on close().
+
+        Args:
+            folder (str): Cache folder from cache_folder().
+            meta (dict): Settings stored next to the arrays (sizes, names, fps, ...).
+        """
+        self.folder = folder
+        self.meta = meta
+        self.frames, self.reuse = [], []
+        self.detections, self.flow, self.behavior = [], [], []
+
+    def add(self, frame_count, detections=None, flow=None, behavior=None, reuse=False):
+        """
+        Record one processed frame.
+
+        Args:
+            frame_count (int): Index of the frame in the video.
+            detections (Detections): Detector output, None for a frame that reused the previous results.
+            flow (list): (dx, dy) per pig in confidence order, NaN where there was none.
+            behavior (dict): Behaviour model output per pig index, or under None for the full frame.
+            reuse (bool): The frame reused the results of the last inferred frame (motion gate).
+        """
+        names = detections.names if detections is not None else {}
+        self.frames.append(frame_count)
+        self.reuse.append(reuse)
+        self.detections.append(detections if detections is not None else Detections([], [], [], names))
+        self.flow.append(np.asarray(flow if flow else [], dtype=np.float32).reshape(-1, 2))
+        self.behavior.append(behavior or {})
+
+        if detections is not None:
+            self.meta.setdefault("detector_names", {str(k): v for k, v in detections.names.items()})
+        for results in (behavior or {}).values():
+            self.meta.setdefault("behavior_names", {str(k): v for k, v in results.names.items()})
+
+    @staticmethod
+    def _starts(counts):
+        return np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64)
+
+    def close(self):
+        """Write the arrays to a temporary folder and move it in place, so readers never see half a cache."""
+        behavior = [(-1 if owner is None else owner, results) for frame in self.behavior for owner, results in sorted(
+            frame.items(), key=lambda item: -1 if item[0] is None else item[0])]
+        arrays = {
+            "frames": np.asarray(self.frames, dtype=np.int64),
+            "reuse": np.asarray(self.reuse, dtype=bool),
+            "det_start": self._starts([len(d) for d in self.detections]),
+            "det_class": np.concatenate([d.class_ids for d in self.detections] or [[]]).astype(np.int16),
+            "det_box": np.concatenate([d.boxes for d in self.detections] or [np.zeros((0, 4))]).astype(np.float32),
+            "det_conf": np.concatenate([d.confidences for d in self.detections] or [[]]).astype(np.float32),
+            "flow_start": self._starts([len(f) for f in self.flow]),
+            "flow": np.concatenate(self.flow or [np.zeros((0, 2))]).astype(np.float32),
+            "beh_start": self._starts([sum(len(r) for r in frame.values()) for frame in self.behavior]),
+            "beh_owner": np.concatenate([np.full(len(r), owner) for owner, r in behavior] or [[]]).astype(np.int32),
+            "beh_class": np.concatenate([r.class_ids for _, r in behavior] or [[]]).astype(np.int16),
+            "beh_box": np.concatenate([r.boxes for _, r in behavior] or [np.zeros((0, 4))]).astype(np.float32),
+            "beh_conf": np.concatenate([r.confidences for _, r in behavior] or [[]]).astype(np.float32),
+        }
+
+        tmp_folder = f"{self.folder}.tmp"
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_folder, f"{name}.npy"), array)
+        with open(os.path.join(tmp_folder, "meta.json"), 'w') as file:
+            json.dump(dict(self.meta, version=VERSION, frame_count=len(self.frames)), file, indent=2)
+
+        shutil.rmtree(self.folder, ignore_errors=True)
+        os.replace(tmp_folder, self.folder)
+
+
+class DetectionCache:
+    def __init__(self, folder):
+        """
+        Read a cache written by DetectionCacheWriter. The arrays are memory-mapped, so only the
+        frames that are replayed are read from disk.
+
+        Args:
+            folder (str): Cache folder from cache_folder().
+        """
+        self.folder = folder
+        with open(os.path.join(folder, "meta.json"), 'r') as file:
+            self.meta = json.load(file)
+        if self.meta.get("version") != VERSION:
+            raise ValueError(f"Detection cache {folder} has version {self.meta.get('version')}, expected {VERSION}")
+        self.arrays = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+        self.detector_names = {int(k): v for k, v in self.meta.get("detector_names", {}).items()}
+        self.behavior_names = {int(k): v for k, v in self.meta.get("behavior_names", {}).items()}
+
+    @staticmethod
+    def exists(folder):
+        return os.path.exists(os.path.join(folder, "meta.json"))
+
+    def __len__(self):
+        return len(self.arrays["frames"])
+
+    def frame(self, n):
+        """Frame index and the CachedFrame of the n-th recorded frame, None if it reused the previous results."""
+        a = self.arrays
+        frame_count = int(a["frames"][n])
+        if a["reuse"][n]:
+            return frame_count, None
+
+        d0, d1 = a["det_start"][n], a["det_start"][n + 1]
+        detections = Detections(a["det_class"][d0:d1], a["det_box"][d0:d1], a["det_conf"][d0:d1], self.detector_names)
+        f0, f1 = a["flow_start"][n], a["flow_start"][n + 1]
+        flow = np.array(a["flow"][f0:f1])
+
+        b0, b1 = a["beh_start"][n], a["beh_start"][n + 1]
+        owners = np.asarray(a["beh_owner"][b0:b1])
+        behavior = {}
+        for owner in np.unique(owners).tolist():
+            rows = np.flatnonzero(owners == owner) + b0
+            behavior[None if owner < 0 else owner] = Detections(
+                a["beh_class"][rows], a["beh_box"][rows], a["beh_conf"][rows], self.behavior_names)
+        return frame_count, CachedFrame(detections, flow, behavior)
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self.frame(n)
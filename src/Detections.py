@@ -0,0 +1,113 @@
+import numpy as np
+
+
+class Detections:
+    def __init__(self, class_ids, boxes, confidences, names):
+        """
+        Detections of one image as contiguous arrays.
+
+        Iterating or indexing with an int gives the legacy (class name, bounding box, confidence)
+        tuples, built lazily on first use, so code written for the tuple lists keeps working.
+
+        Args:
+            class_ids (array): (N,) class ids.
+            boxes (array): (N, 4) boxes [x_min, y_min, x_max, y_max].
+            confidences (array): (N,) confidence scores.
+            names (dict): Class id to class name, as in the YOLO model.
+        """
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.names = names
+        self._name_to_id = None
+        self._by_class = None  # Class id -> indices, built on the first class lookup
+        self._tuples = None
+
+    @classmethod
+    def from_result(cls, result, names):
+        """Build from one Ultralytics result, copying each tensor off the device once."""
+        boxes = result.boxes
+        return cls(boxes.cls.cpu().numpy(), boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), names)
+
+    @classmethod
+    def from_tuples(cls, detections, names):
+        """Build from legacy (class name, bounding box, confidence) tuples."""
+        name_to_id = {name: class_id for class_id, name in names.items()}
+        return cls(
+            [name_to_id[det[0]] for det in detections],
+            [det[1] for det in detections],
+            [det[2] for det in detections],
+            names,
+        )
+
+    @classmethod
+    def concatenate(cls, detections_list, names):
+        """Join several Detections (e.g. one per result) into one."""
+        if len(detections_list) == 1:
+            return detections_list[0]
+        return cls(
+            np.concatenate([d.class_ids for d in detections_list]) if detections_list else [],
+            np.concatenate([d.boxes for d in detections_list]) if detections_list else [],
+            np.concatenate([d.confidences for d in detections_list]) if detections_list else [],
+            names,
+        )
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __bool__(self):
+        return len(self.class_ids) > 0
+
+    def __iter__(self):
+        return iter(self.to_tuples())
+
+    def __getitem__(self, index):
+        """An int gives the legacy tuple, a slice or index array gives a Detections subset."""
+        if isinstance(index, (int, np.integer)):
+            return self.to_tuples()[index]
+        return self.subset(index)
+
+    def to_tuples(self):
+        """Legacy list of (class name, bounding box list, confidence) tuples."""
+        if self._tuples is None:
+            self._tuples = [
+                (self.names[class_id], box, confidence)
+                for class_id, box, confidence in zip(self.class_ids.tolist(), self.boxes.tolist(), self.confidences.tolist())
+            ]
+        return self._tuples
+
+    def class_names(self):
+        return [self.names[class_id] for class_id in self.class_ids.tolist()]
+
+    def subset(self, index):
+        """Detections at the given indices (slice, int array or boolean mask)."""
+        return Detections(self.class_ids[index], self.boxes[index], self.confidences[index], self.names)
+
+    def select(self, class_names):
+        """Detections of the given class names, in their original order."""
+        if self._by_class is None:
+            order = np.argsort(self.class_ids, kind="stable")
+            ids, starts = np.unique(self.class_ids[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            self._by_class = {int(class_id): order[start:end] for class_id, start, end in zip(ids, starts, ends)}
+            self._name_to_id = {name: class_id for class_id, name in self.names.items()}
+
+        indices = [self._by_class[self._name_to_id[name]] for name in class_names
+                   if name in self._name_to_id and self._name_to_id[name] in self._by_class]
+        if not indices:
+            return self.subset(slice(0, 0))
+        if len(indices) == 1:
+            return self.subset(indices[0])
+        return self.subset(np.sort(np.concatenate(indices)))
+
+    def sorted_by_confidence(self):
+        """Detections sorted by confidence, highest first."""
+        return self.subset(np.argsort(-self.confidences, kind="stable"))
+
+    def with_boxes(self, boxes):
+        """Same detections with replaced boxes, e.g. resized faucet boxes."""
+        return Detections(self.class_ids, boxes, self.confidences, self.names)
+
+    def offset(self, dx, dy):
+        """Same detections with the boxes shifted, e.g. from crop to frame coordinates."""
+        return self.with_boxes(self.boxes + np.array([dx, dy, dx, dy], dtype=np.float32))
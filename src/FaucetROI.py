@@ -0,0 +1,113 @@
+import numpy as np
+from UsefulMath import UMath
+
+
+class FaucetROI:
+    def __init__(self, faucet_boxes=None, stable_frames=30, tile_size=480, max_faucets=2, iou_threshold=0.5):
+        """
+        Drinking zones around the faucets, used to run the detector on tiles instead of the full frame.
+
+        Faucets do not move, so their boxes are either taken from the configuration or learned from the
+        full-frame detections: a faucet counts as stable once it was found at the same place in
+        stable_frames frames. Until then the detector keeps running on the full frame.
+
+        Args:
+            faucet_boxes (list): Configured faucet boxes [x_min, y_min, x_max, y_max]. Stable from the start.
+            stable_frames (int): Frames a learned faucet must be seen at the same place.
+            tile_size (int): Side in pixels of the square tile around each faucet, cropped at native resolution.
+            max_faucets (int): Number of faucets to learn.
+            iou_threshold (float): Minimum IoU for a detection to count as the same faucet.
+        """
+        self.stable_frames = stable_frames
+        self.tile_size = tile_size
+        self.max_faucets = max_faucets
+        self.iou_threshold = iou_threshold
+
+        self.boxes = np.asarray(faucet_boxes or [], dtype=np.float32).reshape(-1, 4)
+        self.hits = np.full(len(self.boxes), stable_frames, dtype=np.int32)
+        self.misses = np.zeros(len(self.boxes), dtype=np.int32)
+        self.configured = len(self.boxes) > 0
+        self._tiles = None  # (frame shape, tiles) of the last call to tiles()
+
+    @property
+    def stable(self):
+        return self.configured or int((self.hits >= self.stable_frames).sum()) >= self.max_faucets
+
+    def observe(self, faucet_boxes):
+        """
+        Learn the faucet positions from the faucets detected on a full frame.
+
+        Args:
+            faucet_boxes (ndarray): (N, 4) detected faucet boxes, highest confidence first.
+        """
+        if self.stable:
+            return
+        faucet_boxes = np.asarray(faucet_boxes, dtype=np.float32).reshape(-1, 4)[:self.max_faucets]
+
+        seen = np.zeros(len(self.boxes), dtype=bool)
+        new = []
+        if len(self.boxes) and len(faucet_boxes):
+            iou = UMath.iou_matrix(self.boxes, faucet_boxes)
+            best = iou.argmax(axis=0)
+            for d, row in enumerate(best):
+                if iou[row, d] >= self.iou_threshold and not seen[row]:
+                    # Running average smooths out the jitter of the detected box
+                    self.boxes[row] += (faucet_boxes[d] - self.boxes[row]) / (self.hits[row] + 1)
+                    self.hits[row] += 1
+                    seen[row] = True
+                else:
+                    new.append(faucet_boxes[d])
+        else:
+            new = list(faucet_boxes)
+
+        # Candidates that were not seen for stable_frames frames are forgotten
+        self.misses = np.where(seen, 0, self.misses + 1)
+        keep = self.misses < self.stable_frames
+        self.boxes, self.hits, self.misses = self.boxes[keep], self.hits[keep], self.misses[keep]
+
+        if new:
+            self.boxes = np.concatenate([self.boxes, np.asarray(new, dtype=np.float32)])
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int32)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new), dtype=np.int32)])
+
+    def faucet_boxes(self):
+        """Boxes of the stable faucets, most often seen first."""
+        if self.configured:
+            return self.boxes
+        order = np.argsort(-self.hits, kind="stable")[:self.max_faucets]
+        return self.boxes[order]
+
+    def tiles(self, frame_shape):
+        """
+        Square tiles of tile_size pixels centered on each stable faucet, kept inside the frame.
+        Overlapping tiles are merged so no region is detected twice.
+
+        Args:
+            frame_shape (tuple): Shape of the frame (height, width, ...).
+
+        Returns:
+            list: Tiles (x_min, y_min, x_max, y_max) as ints.
+        """
+        if self._tiles is not None and self._tiles[0] == frame_shape[:2]:
+            return self._tiles[1]
+
+        height, width = frame_shape[:2]
+        tiles = []
+        for cx, cy in UMath.get_centers(self.faucet_boxes()).tolist():
+            x_min = int(min(max(0, cx - self.tile_size / 2), max(0, width - self.tile_size)))
+            y_min = int(min(max(0, cy - self.tile_size / 2), max(0, height - self.tile_size)))
+            tiles.append([x_min, y_min, min(width, x_min + self.tile_size), min(height, y_min + self.tile_size)])
+
+        merged = []
+        for tile in sorted(tiles):
+            if merged and tile[0] < merged[-1][2] and tile[1] < merged[-1][3] and tile[3] > merged[-1][1]:
+                last = merged[-1]
+                merged[-1] = [min(last[0], tile[0]), min(last[1], tile[1]), max(last[2], tile[2]), max(last[3], tile[3])]
+            else:
+                merged.append(tile)
+
+        tiles = [tuple(tile) for tile in merged]
+        # Only cache once the boxes can no longer change
+        if self.stable:
+            self._tiles = (frame_shape[:2], tiles)
+        return tiles
@@ -1,5 +1,9 @@
 import cv2
 import os
+import queue
+import threading
+import time
+from Print import Print
 
 # Video Processor Class: Manages video capture and display
 class FrameHandler:
@@ -10,20 +14,204 @@ class FrameHandler:
         self.manual_control = False  # Flag to control whether to manually step through the video
         self.video_name = os.path.basename(video_path)  # Extract video name from the path
 
+        # Streams report no frame count and cannot seek, so they always fall back to grabbing
+        self.is_stream = self.cap.get(cv2.CAP_PROP_FRAME_COUNT) <= 0
+        self.can_seek = not self.is_stream
+        # Seeking lands on the previous keyframe and decodes forward from there, so it only
+        # pays off when the gap is longer than the keyframe distance (~2 seconds for most cameras)
+        self.keyframe_interval = max(1, int(2 * (self.get_fps() or 25)))
+
+        # Background reader state, only used after start_reader()
+        self.frame_queue = None
+        self.reader_thread = None
+        self.stop_event = threading.Event()
+        self.drop_oldest = False
+        self.dropped_frames = 0
+        self.reader_error = None  # Exception that ended the reader thread, raised again in the consumer
+        self.process_interval = 1  # Read by the reader thread on every frame, so it can change while running
+        # Headless OpenCV builds raise on any window call, so windows are only closed if one was opened
+        self.window_shown = False
+
     def get_frame(self, process_interval, frame_count):
         ret, frame = self.cap.read()
         if not ret:
             return None, frame_count
         return frame, frame_count + 1
 
+    def get_sampled_frame(self, process_interval, frame_count):
+        """
+        Advance to the next frame that should be processed and only decode that one.
+
+        Skipped frames are grabbed without being retrieved (no decode to BGR). When the gap
+        is longer than the keyframe interval the capture seeks straight to the target frame.
+
+        The capture is always one frame ahead of frame_count: the first frame is read before
+        counting starts, so the next read returns frame index frame_count + 1.
+
+        Args:
+            process_interval (int): Process every Nth frame.
+            frame_count (int): Index of the last frame consumed.
+
+        Returns:
+            tuple: (frame, frame_count) where frame_count is a multiple of process_interval,
+                   or (None, frame_count) when the video has ended.
+        """
+        process_interval = max(1, int(process_interval))
+        target = (frame_count // process_interval + 1) * process_interval
+        skip = target - frame_count - 1
+
+        if self.can_seek and skip > self.keyframe_interval:
+            # The next read returns the target frame, which get_frame counts as target
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == target:
+                frame_count = target - 1
+                skip = 0
+            else:
+                # Backend could not seek accurately, grab the rest of the way instead
+                self.can_seek = False
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count + 1)
+
+        for _ in range(skip):
+            if not self.cap.grab():
+                return None, frame_count
+            frame_count += 1
+
+        return self.get_frame(process_interval, frame_count)
+
+    def seek(self, position):
+        """
+        Move the capture so the next read returns the frame at index position.
+
+        Returns:
+            bool: True if the backend landed exactly on the frame.
+        """
+        if not self.can_seek:
+            return False
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        return int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == position
+
+    def start_reader(self, process_interval, frame_count=0, queue_size=8, drop_oldest=False):
+        """
+        Start a background thread that decodes sampled frames into a bounded queue.
+
+        Args:
+            process_interval (int): Process every Nth frame.
+            frame_count (int): Number of frames already consumed from the capture.
+            queue_size (int): Maximum number of decoded frames waiting to be processed.
+            drop_oldest (bool): When the queue is full, discard the oldest frame instead of
+                                blocking the reader. Keeps live streams close to real time.
+        """
+        self.frame_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.drop_oldest = drop_oldest
+        self.process_interval = process_interval
+        self.stop_event.clear()
+        self.reader_thread = threading.Thread(
+            target=self._read_frames, args=(frame_count,), daemon=True
+        )
+        self.reader_thread.start()
+
+    def _read_frames(self, frame_count):
+        """Reader thread: fill the queue with (frame_index, timestamp, frame) tuples."""
+        try:
+            while not self.stop_event.is_set():
+                frame, frame_count = self.get_sampled_frame(self.process_interval, frame_count)
+                if frame is None:
+                    break
+
+                # Wall clock for streams, position in the file otherwise
+                timestamp = time.time() if self.is_stream else self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                self._enqueue((frame_count, timestamp, frame))
+        except Exception as e:
+            self.reader_error = e
+        finally:
+            # Sentinel so the consumer knows the capture has ended, also when reading failed
+            self._enqueue(None)
+
+    def _enqueue(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.frame_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.drop_oldest and item is not None:
+                    try:
+                        self.frame_queue.get_nowait()
+                        self.dropped_frames += 1
+                    except queue.Empty:
+                        pass
+
+    def get_queued_frame(self, block=True):
+        """
+        Take the next decoded frame from the background reader.
+
+        Args:
+            block (bool): Wait for a frame. Without waiting queue.Empty is raised if none is ready.
+
+        Returns:
+            tuple: (frame_index, timestamp, frame), or None when the capture has ended.
+
+        Raises:
+            Exception: The error that stopped the reader thread, once its queued frames are taken.
+        """
+        item = self.frame_queue.get(block)
+        if item is None and self.reader_error is not None:
+            error, self.reader_error = self.reader_error, None
+            raise error
+        return item
+
+    def next_frame(self, process_interval, frame_count):
+        """
+        Return the next frame to process, from the background reader if it is running.
+
+        The reader thread picks up a changed process_interval for the frames it decodes next,
+        frames already in the queue keep the interval they were sampled with.
+
+        Returns:
+            tuple: (frame, frame_count), or (None, frame_count) when the video has ended.
+        """
+        if self.reader_thread is None:
+            return self.get_sampled_frame(process_interval, frame_count)
+
+        self.process_interval = process_interval
+
+        item = self.get_queued_frame()
+        if item is None:
+            return None, frame_count
+        frame_count, _, frame = item
+        return frame, frame_count
+
+    def stop_reader(self, timeout=2.0):
+        """
+        Stop the background reader. On a stalled stream the reader can be blocked inside cap.read()
+        for longer than timeout seconds. OpenCV does not support releasing a capture while another
+        thread reads from it, so a stalled reader is left behind as a daemon thread instead.
+
+        Returns:
+            bool: True if the reader has stopped (or was not running).
+        """
+        if self.reader_thread is None:
+            return True
+        self.stop_event.set()
+        self.reader_thread.join(timeout)
+        if self.reader_thread.is_alive():
+            Print.print_warning(f"Reader of {self.video_name} is still blocked reading after {timeout:.0f}s, "
+                                f"leaving it behind")
+            return False
+        self.reader_thread = None
+        return True
+
     def release(self):
-        self.cap.release()
-        cv2.destroyAllWindows()
+        # A reader still inside cap.read() would crash if the capture were released under it
+        if self.stop_reader():
+            self.cap.release()
+        if self.window_shown:
+            cv2.destroyAllWindows()
 
     def showFrame(self, frame, headless):
         if not headless:
             # Set the window title to the video name
             cv2.imshow(f"Pig Behavior Detection - {self.video_name}", frame)
+            self.window_shown = True
 
     def check_for_key_press(self):
         """
@@ -43,7 +231,7 @@ class FrameHandler:
         # Toggle manual control with 'm' key
         if key == ord('m'):
             self.toggle_manual_control()
-            print(f"Manual control {'enabled' if self.manual_control else 'disabled'}")
+            Print.print_info(f"Manual control {'enabled' if self.manual_control else 'disabled'}")
             return False  # Do not exit the loop
 
         # Check for manual control (b to go to next frame)
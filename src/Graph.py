@@ -1,18 +1,29 @@
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
+from Aggregates import AggregateStore
 
 class BehaviourGraph:
     def __init__(self, csv_file="behavior_log.csv"):
+        # A fullday_aggregates.json store is plotted from its precomputed bins without reading any CSV
         self.csv_file = csv_file
+        self.from_aggregates = csv_file.endswith(".json")
 
     def load_data(self):
-        """Load the CSV file into a DataFrame."""
+        """Load the CSV file, or a Parquet file/dataset folder written with --parquet, into a DataFrame."""
+        if self.csv_file.endswith(".parquet") or os.path.isdir(self.csv_file):
+            data = pd.read_parquet(self.csv_file)
+            # Use the CSV column name so the plots work with both formats
+            return data.rename(columns={"behavior": "Behavior"})
         return pd.read_csv(self.csv_file)
 
     def plot_behavior_counts(self):
         """Plot the count of each behavior."""
-        data = self.load_data()
-        behavior_counts = data["Behavior"].value_counts()
+        if self.from_aggregates:
+            behavior_counts = pd.Series(AggregateStore.load(self.csv_file)["counts"]).sort_values(ascending=False)
+        else:
+            data = self.load_data()
+            behavior_counts = data["Behavior"].value_counts()
 
       
 
@@ -24,8 +35,17 @@ class BehaviourGraph:
         plt.ylabel("Frequency")
         plt.show()
 
-    def plot_behavior_over_time(self):
-        """Plot the behavior occurrences over time."""
+    def plot_behavior_over_time(self, resolution="hourly"):
+        """
+        Plot the behavior occurrences over time.
+
+        Args:
+            resolution (str): 'hourly' or 'minutely' time-of-day bins, only used with an aggregate store.
+        """
+        if self.from_aggregates:
+            self.plot_binned_behavior(resolution)
+            return
+
         data = self.load_data()
         data["Timestamp"] = pd.to_datetime(data["Timestamp"])
         data.set_index("Timestamp", inplace=True)
@@ -38,6 +58,22 @@ class BehaviourGraph:
         plt.ylabel("Occurrences")
         plt.show()
 
+    def plot_binned_behavior(self, resolution="hourly"):
+        """Plot the time-of-day bins of an aggregate store, one line per behavior."""
+        store = AggregateStore.load(self.csv_file)
+        bins = pd.DataFrame(store[resolution])
+        if resolution == "hourly":
+            bins.index = [f"{hour:02d}:00" for hour in range(24)]
+        else:
+            bins.index = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(1440)]
+
+        plt.figure(figsize=(10, 6))
+        bins.plot(ax=plt.gca(), marker='o' if resolution == "hourly" else None)
+        plt.title(f"Behavior Occurrences Over Time - {store['pen']}")
+        plt.xlabel("Time of day")
+        plt.ylabel("Occurrences")
+        plt.show()
+
     def show_plots_separately(self):
         """Display the plots in separate windows at the same time."""
         # Plot behavior counts in one window
@@ -0,0 +1,169 @@
+import collections
+import json
+import os
+import threading
+import time
+from Print import Print
+
+# Pipeline stages timed by the processing loop, in pipeline order
+STAGES = ("decode", "motion", "detector", "behavior", "geometry", "drawing", "overlay", "display", "csv", "mqtt")
+
+
+class _NullTimer:
+    """Timer used while metrics are disabled, costs one attribute lookup per stage."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    # One reused timer per stage, stages are timed on the processing thread and never nested in themselves
+    __slots__ = ("samples", "start")
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, window=1000):
+        """
+        Per-stage latency timers and throughput counters of the process.
+
+        Recording a sample only appends to a bounded deque; percentiles are computed when a
+        report is written, so the timers can stay enabled in production.
+
+        Args:
+            window (int): Number of most recent samples per stage the percentiles are computed over.
+        """
+        self.window = window
+        self.enabled = False
+        self.interval = 60.0
+        self.dump_file = None
+        self.samples = {stage: collections.deque(maxlen=window) for stage in STAGES}
+        self._timers = {stage: _StageTimer(samples) for stage, samples in self.samples.items()}
+        self.frames = 0
+        self.dropped_frames = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.last_report_frames = 0
+        self.lock = threading.Lock()
+
+    def configure(self, enabled=True, interval=60.0, dump_file=None):
+        """
+        Args:
+            enabled (bool): Record timings and counters.
+            interval (float): Seconds between report lines (and dump file updates).
+            dump_file (str): File the metrics are written to on every report; '.prom' gives
+                             Prometheus text format, anything else JSON. None for no file.
+        """
+        self.enabled = enabled
+        self.interval = interval
+        self.dump_file = dump_file
+
+    def timer(self, stage):
+        """Context manager that records the time spent in a stage: with metrics.timer("detector"): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        timer = self._timers.get(stage)
+        if timer is None:
+            with self.lock:
+                self.samples[stage] = collections.deque(maxlen=self.window)
+                timer = self._timers[stage] = _StageTimer(self.samples[stage])
+        return timer
+
+    def frame_done(self, dropped_frames=None):
+        """Count a processed frame and write a report when the interval has passed."""
+        if not self.enabled:
+            return
+        self.frames += 1
+        if dropped_frames is not None:
+            self.dropped_frames = dropped_frames
+        if time.monotonic() - self.last_report >= self.interval:
+            self.report()
+
+    @staticmethod
+    def _percentiles(samples):
+        values = sorted(samples)
+        if not values:
+            return None
+        last = len(values) - 1
+        return {q: values[min(last, int(round(q / 100.0 * last)))] for q in (50, 95, 99)}
+
+    def snapshot(self):
+        """Current metrics as a dict: fps, counters and p50/p95/p99 in milliseconds per stage."""
+        now = time.monotonic()
+        elapsed = max(1e-9, now - self.last_report)
+        stages = {}
+        for stage, samples in list(self.samples.items()):
+            percentiles = self._percentiles(list(samples))
+            if percentiles is not None:
+                stages[stage] = {f"p{q}_ms": value * 1000.0 for q, value in percentiles.items()}
+                stages[stage]["count"] = len(samples)
+        return {
+            "pid": os.getpid(),
+            "uptime_s": now - self.started,
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "fps": (self.frames - self.last_report_frames) / elapsed,
+            "stages": stages,
+        }
+
+    def report(self):
+        """Log one summary line and update the dump file."""
+        snapshot = self.snapshot()
+        stages = " ".join(f"{stage}={values['p50_ms']:.1f}/{values['p95_ms']:.1f}/{values['p99_ms']:.1f}ms"
+                          for stage, values in snapshot["stages"].items())
+        Print.print_info(f"{snapshot['fps']:.2f} fps, {snapshot['frames']} frames, "
+                         f"{snapshot['dropped_frames']} dropped, p50/p95/p99 {stages}")
+        if self.dump_file:
+            self.dump(snapshot)
+        self.last_report = time.monotonic()
+        self.last_report_frames = self.frames
+
+    def dump(self, snapshot=None):
+        """Write the metrics to dump_file, replacing it atomically so readers never see half a file."""
+        snapshot = snapshot or self.snapshot()
+        if self.dump_file.endswith(".prom"):
+            text = self.prometheus_text(snapshot)
+        else:
+            text = json.dumps(snapshot, indent=2)
+        tmp_file = f"{self.dump_file}.tmp"
+        try:
+            with open(tmp_file, "w") as file:
+                file.write(text)
+            os.replace(tmp_file, self.dump_file)
+        except OSError as e:
+            Print.print_error(f"Could not write metrics to {self.dump_file}: {e}")
+
+    @staticmethod
+    def prometheus_text(snapshot):
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE pigmaps_frames_total counter", f"pigmaps_frames_total {snapshot['frames']}",
+            "# TYPE pigmaps_dropped_frames_total counter", f"pigmaps_dropped_frames_total {snapshot['dropped_frames']}",
+            "# TYPE pigmaps_fps gauge", f"pigmaps_fps {snapshot['fps']:.3f}",
+            "# TYPE pigmaps_stage_seconds summary",
+        ]
+        for stage, values in snapshot["stages"].items():
+            for q in (50, 95, 99):
+                lines.append(f'pigmaps_stage_seconds{{stage="{stage}",quantile="0.{q}"}} {values[f"p{q}_ms"] / 1000.0:.6f}')
+            lines.append(f'pigmaps_stage_window_samples{{stage="{stage}"}} {values["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+# Metrics of this process, configured once in main (or in each worker process)
+metrics = Metrics()
@@ -1,43 +1,155 @@
-from ultralytics import YOLO
+from Detections import Detections
+import numpy as np
 import sys, os
 
+try:
+    from ultralytics import YOLO
+except ImportError:  # Only needed to run the models, not to replay a detection cache
+    YOLO = None
+
+DETECTOR_MODEL = "Model_20_02_2024_V17Nano.pt"
+BEHAVIOR_MODEL = "yolo11.pt"
+
 class ModelHandler:
-    def __init__(self, model_path = "Model_20_02_2024_V17Nano.pt"):
-        self.chosen_model = YOLO(model_path)  # Replace with the actual model path
+    # Loaded models shared by every handler in the process, keyed by (absolute weights path, device)
+    _models = {}
+
+    def __init__(self, model_path = DETECTOR_MODEL, device=None, names=None):
+        """
+        Args:
+            model_path (str): Path to the weights file.
+            device (str): Device to run the model on, or None for the default.
+            names (dict): Class id to class name. If given the model is not loaded, e.g. to replay a detection cache.
+        """
+        self.device = device
+        self.chosen_model = ModelHandler.load_model(model_path, device) if names is None else None
+        self.names = names if names is not None else self.chosen_model.names
         self.conf = 0.30  # Confidence threshold
 
-    def get_detections(self, img):
+    @classmethod
+    def load_model(cls, model_path, device=None, warmup=True):
+        """
+        Load a YOLO model once per process and return the shared instance.
+
+        Args:
+            model_path (str): Path to the weights file.
+            device (str): Device to run the model on (e.g. 'cpu', 'cuda:0'), or None for the default.
+            warmup (bool): Run a dummy inference after loading so the first real frame is not slow.
+
+        Returns:
+            YOLO: The loaded model.
+        """
+        key = (os.path.abspath(model_path), device)
+        if key not in cls._models:
+            if YOLO is None:
+                raise ImportError("Running the models requires ultralytics: pip install ultralytics")
+            model = YOLO(model_path)
+            if warmup:
+                cls.warmup_model(model, device)
+            cls._models[key] = model
+        return cls._models[key]
+
+    @staticmethod
+    def warmup_model(model, device=None, imgsz=640):
+        """Run one inference on a blank image to initialise the predictor and its buffers."""
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        sys.stdout = open(os.devnull, 'w')
+        model.predict(dummy, device=device, verbose=False)
+        sys.stdout = sys.__stdout__
+
+    @classmethod
+    def preload(cls, model_paths=(DETECTOR_MODEL, BEHAVIOR_MODEL), device=None):
+        """Load and warm up the given models at startup."""
+        for model_path in model_paths:
+            cls.load_model(model_path, device)
+
+    def get_detections(self, img, imgsz=None):
         """
         Extract and filter detections from the YOLO model, including confidence scores.
 
         Args:
             img (ndarray): Input image to be processed by the model.
+            imgsz (int): Optional model input size, e.g. smaller for crops. Defaults to the model's own size.
 
         Returns:
-            list: A list of tuples containing the class name, bounding box coordinates, and confidence score.
+            Detections: Class ids, bounding boxes and confidence scores as arrays. Iterating it gives
+                        (class name, bounding box, confidence) tuples.
         """
         sys.stdout = open(os.devnull, 'w')
 
-        results = self.chosen_model.predict(img, self.conf,verbose =False)
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        results = self.chosen_model.predict(img, conf=self.conf, device=self.device, verbose=False, **kwargs)
         sys.stdout = sys.__stdout__
 
-        detections = [
-            (self.chosen_model.names[int(box.cls[0])], box.xyxy[0].tolist(), box.conf[0].item())
-            for result in results
-            for box in result.boxes
-        ]
-        return detections
+        names = self.chosen_model.names
+        return Detections.concatenate([Detections.from_result(result, names) for result in results], names)
+
+    def get_detections_batch(self, imgs):
+        """
+        Run the YOLO model on several images in one call.
+
+        Args:
+            imgs (list): List of input images (ndarray).
+
+        Returns:
+            list: One Detections per input image, in input order.
+        """
+        if not imgs:
+            return []
+
+        sys.stdout = open(os.devnull, 'w')
+        results = self.chosen_model.predict(list(imgs), conf=self.conf, device=self.device, verbose=False)
+        sys.stdout = sys.__stdout__
+
+        return [Detections.from_result(result, self.chosen_model.names) for result in results]
+
+    def get_detections_tiles(self, imgs, tiles):
+        """
+        Run the YOLO model only on tiles cropped from each image, at their native resolution.
+
+        Args:
+            imgs (list): List of input images (ndarray).
+            tiles (list): Tiles (x_min, y_min, x_max, y_max) cropped from every image.
+
+        Returns:
+            list: One Detections per input image with the boxes in image coordinates, in input order.
+        """
+        if not imgs or not tiles:
+            return [Detections([], [], [], self.chosen_model.names) for _ in imgs]
+
+        crops, owners = [], []
+        for n, img in enumerate(imgs):
+            for x_min, y_min, x_max, y_max in tiles:
+                crops.append(img[y_min:y_max, x_min:x_max])
+                owners.append((n, x_min, y_min))
+
+        # Input size of the largest tile, rounded up to the model stride, so crops are not downscaled
+        imgsz = -(-max(max(x_max - x_min, y_max - y_min) for x_min, y_min, x_max, y_max in tiles) // 32) * 32
+
+        sys.stdout = open(os.devnull, 'w')
+        results = self.chosen_model.predict(crops, conf=self.conf, device=self.device, imgsz=imgsz, verbose=False)
+        sys.stdout = sys.__stdout__
+
+        names = self.chosen_model.names
+        per_image = [[] for _ in imgs]
+        for (n, dx, dy), result in zip(owners, results):
+            per_image[n].append(Detections.from_result(result, names).offset(dx, dy))
+        return [Detections.concatenate(detections, names) for detections in per_image]
+
+    def get_class_detection(self, detections, target_classes):
+        """Filter detections by class name. Uses the per-class index of Detections, scans tuple lists otherwise."""
+        if isinstance(detections, Detections):
+            return detections.select(target_classes)
+        return [det for det in detections if det[0] in target_classes]
 
     def get_pig_detection(self, detections, target_classes=["Pig-laying", "Pig-standing"]):
         # Filter detections for pigs
-        pigs = [det for det in detections if det[0] in target_classes]
-        return pigs
+        return self.get_class_detection(detections, target_classes)
     
     def get_faucet_detection(self, detections, target_classes=["Water-faucets"]):
-        # Filter detections for pigs
-        faucet = [det for det in detections if det[0] in target_classes]
-        return faucet
+        # Filter detections for faucets
+        return self.get_class_detection(detections, target_classes)
+
     def get_feces_detection(self, detections, target_classes=["feces"]):
-        # Filter detections for pigs
-        faucet = [det for det in detections if det[0] in target_classes]
-        return faucet
+        # Filter detections for feces
+        return self.get_class_detection(detections, target_classes)
@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, threshold=0.01, faucet_threshold=0.002, pixel_threshold=15, width=160,
+                 max_skip=10, ramp=4, faucet_boxes=None):
+        """
+        Cheap frame-difference check run before detection, so static frames can reuse the previous results.
+
+        Args:
+            threshold (float): Fraction of changed pixels in the whole frame that counts as motion.
+            faucet_threshold (float): Fraction of changed pixels inside the faucet regions that counts as motion.
+                                      Lower than threshold so activity at the faucets is never missed.
+            pixel_threshold (int): Minimum grayscale difference (0-255) for a pixel to count as changed.
+            width (int): Width the frame is downscaled to before comparing.
+            max_skip (int): Run detection at least every max_skip sampled frames, even if nothing moved.
+            ramp (int): Divide the sampling interval by this while there is motion near a faucet.
+            faucet_boxes (list): Faucet boxes [x_min, y_min, x_max, y_max] in frame coordinates.
+        """
+        self.threshold = threshold
+        self.faucet_threshold = faucet_threshold
+        self.pixel_threshold = pixel_threshold
+        self.width = width
+        self.max_skip = max_skip
+        self.ramp = max(1, ramp)
+        self.faucet_boxes = [list(box) for box in faucet_boxes or []]
+
+        self.prev_small = None
+        self.scale = None  # Frame to small image scale factor
+        self.static_frames = 0
+        self.faucet_motion = False
+        self.frames = 0
+        self.skipped = 0
+        self.last_score = 0.0
+        self.last_faucet_score = 0.0
+
+    def set_faucet_boxes(self, boxes):
+        """Update the faucet regions, e.g. with the faucets detected on the last inferred frame."""
+        if len(boxes):
+            self.faucet_boxes = [list(box) for box in np.asarray(boxes).reshape(-1, 4).tolist()]
+
+    def _small_gray(self, frame):
+        height, width = frame.shape[:2]
+        self.scale = self.width / float(width)
+        small = cv2.resize(frame, (self.width, max(1, int(height * self.scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def score(self, frame):
+        """
+        Motion scores of a frame compared with the previous one.
+
+        Returns:
+            tuple: (fraction of changed pixels in the frame, highest fraction of changed pixels in a faucet region)
+        """
+        small = self._small_gray(frame)
+        if self.prev_small is None or self.prev_small.shape != small.shape:
+            self.prev_small = small
+            return 1.0, 1.0
+
+        changed = cv2.absdiff(small, self.prev_small) > self.pixel_threshold
+        self.prev_small = small
+
+        faucet_score = 0.0
+        for x_min, y_min, x_max, y_max in self.faucet_boxes:
+            region = changed[max(0, int(y_min * self.scale)):max(0, int(y_max * self.scale)) + 1,
+                             max(0, int(x_min * self.scale)):max(0, int(x_max * self.scale)) + 1]
+            if region.size:
+                faucet_score = max(faucet_score, float(region.mean()))
+        return float(changed.mean()), faucet_score
+
+    def should_infer(self, frame):
+        """Return True if detection has to run on this frame, False if the previous results can be reused."""
+        self.frames += 1
+        self.last_score, self.last_faucet_score = self.score(frame)
+        self.faucet_motion = self.last_faucet_score > self.faucet_threshold
+
+        if self.last_score > self.threshold or self.faucet_motion or self.static_frames >= self.max_skip:
+            self.static_frames = 0
+            return True
+
+        self.static_frames += 1
+        self.skipped += 1
+        return False
+
+    def interval(self, base_interval):
+        """Sampling interval to use next: shorter while there is motion near a faucet."""
+        if self.faucet_motion:
+            return max(1, base_interval // self.ramp)
+        return base_interval
+
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
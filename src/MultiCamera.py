@@ -0,0 +1,194 @@
+import os
+import queue
+import time
+import yaml
+from urllib.parse import urlparse
+from FrameHandler import FrameHandler
+from VideoProcessor import VideoProcessor
+from Metrics import metrics
+from Print import Print
+
+
+def load_cameras(cameras_file):
+    """
+    Read the list of cameras from a YAML file.
+
+    Either a mapping of camera name to source:
+        pen1: rtsp://10.0.0.11/stream
+        pen2: recordings/pen2.mp4
+    or a list of sources, named after the stream host or the file name.
+
+    Returns:
+        list: (name, source) pairs with unique names, in file order.
+    """
+    with open(cameras_file, 'r') as file:
+        entries = yaml.safe_load(file) or []
+
+    if isinstance(entries, dict):
+        pairs = [(str(name), str(source)) for name, source in entries.items()]
+    else:
+        pairs = []
+        for source in entries:
+            parsed_url = urlparse(str(source))
+            name = parsed_url.netloc if parsed_url.scheme else os.path.splitext(os.path.basename(str(source)))[0]
+            pairs.append((name or "stream", str(source)))
+
+    # Two cameras must never write to the same output folder
+    seen = {}
+    cameras = []
+    for name, source in pairs:
+        seen[name] = seen.get(name, 0) + 1
+        cameras.append((name if seen[name] == 1 else f"{name}-{seen[name]}", source))
+    return cameras
+
+
+class Camera:
+    def __init__(self, name, source, args, logger, i, config):
+        """
+        One camera: a background reader and the per-video state (PigMaps, tracker, events, CSVLogger).
+
+        Args:
+            name (str): Camera name, also used for the output folder.
+            source (str): Stream URL or video file.
+            args: Parsed command line arguments.
+            logger (CSVLogger): Logger of this camera.
+            i (int): Index of the camera.
+            config (Mapping): Read-only configuration shared by all cameras.
+        """
+        self.name = name
+        self.frameHandler = FrameHandler(source)
+        frame, _ = self.frameHandler.get_frame(args.fps, 0)
+        if frame is None:
+            raise ValueError(f"Error: Could not read a frame from {source}")
+        self.processor = VideoProcessor(args, logger, i, frame, config)
+
+        # Live cameras drop their oldest frame when the scheduler falls behind, files wait
+        self.process_interval = max(1, int((self.frameHandler.get_fps() or 25) / args.fps))
+        self.frameHandler.start_reader(self.process_interval, 0, args.queue_size, drop_oldest=self.frameHandler.is_stream)
+
+        self.min_period = 1.0 / args.camera_max_fps if args.camera_max_fps > 0 else 0.0
+        self.next_due = 0.0
+        self.finished = False
+
+    def poll(self, now):
+        """
+        Take the next decoded frame without waiting, if the rate limit allows it.
+
+        Returns:
+            tuple: (frame_index, timestamp, frame), or None if no frame may be taken now.
+        """
+        if self.finished or now < self.next_due:
+            return None
+        try:
+            item = self.frameHandler.get_queued_frame(block=False)
+        except queue.Empty:
+            return None
+        if item is None:
+            self.finished = True
+            return None
+        self.next_due = now + self.min_period
+        return item
+
+    def close(self):
+        self.frameHandler.release()
+        self.processor.finish()
+
+
+class InferenceScheduler:
+    def __init__(self, cameras, batch_size=8, max_wait=0.05, frames_per_camera=1):
+        """
+        Collect frames from every camera into shared detector calls and hand the results back.
+
+        Cameras are polled round robin from a rotating start, and each camera contributes at most
+        frames_per_camera frames to a batch, so a fast or backed-up camera cannot starve the others.
+
+        Args:
+            cameras (list): Camera instances.
+            batch_size (int): Maximum number of frames per detector call.
+            max_wait (float): Seconds to wait for more frames before running a partial batch.
+            frames_per_camera (int): Maximum frames of one camera in one batch.
+        """
+        self.cameras = cameras
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.frames_per_camera = max(1, frames_per_camera)
+        self.offset = 0
+
+    def active(self):
+        return [camera for camera in self.cameras if not camera.finished]
+
+    def collect(self):
+        """Gather the next batch as (camera, frame_index, frame) tuples."""
+        batch = []
+        taken = {}
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            cameras = self.active()
+            if not cameras:
+                break
+            took = False
+            now = time.monotonic()
+            start = self.offset % len(cameras)
+            for camera in cameras[start:] + cameras[:start]:
+                if len(batch) >= self.batch_size:
+                    break
+                if taken.get(camera.name, 0) >= self.frames_per_camera:
+                    continue
+                item = camera.poll(now)
+                if item is not None:
+                    frame_count, _, frame = item
+                    batch.append((camera, frame_count, frame))
+                    taken[camera.name] = taken.get(camera.name, 0) + 1
+                    took = True
+            self.offset += 1
+
+            if not took:
+                if batch and now >= deadline:
+                    break
+                time.sleep(0.002)
+        return batch
+
+    def process(self, batch):
+        """Run the detector once for the batch and the behaviour logic per camera. Returns True to stop."""
+        infer = []
+        for camera, frame_count, frame in batch:
+            gate = camera.processor.motion_gate
+            if gate is None:
+                infer.append(True)
+                continue
+            with metrics.timer("motion"):
+                infer.append(gate.should_infer(frame))
+            camera.frameHandler.process_interval = gate.interval(camera.process_interval)
+
+        # Full frames of all cameras go to the shared detector together; cameras with stable
+        # faucet tiles have their own crops and are detected on their own
+        detections = [None] * len(batch)
+        shared = []
+        for n, (camera, _, frame) in enumerate(batch):
+            if not infer[n]:
+                continue
+            pigMaps = camera.processor.pigMaps
+            if pigMaps.faucet_roi is not None and pigMaps.faucet_roi.stable:
+                detections[n] = pigMaps.get_detections(frame)
+            else:
+                shared.append(n)
+        if shared:
+            with metrics.timer("detector"):
+                model_handler = batch[shared[0]][0].processor.pigMaps.model_handler
+                results = model_handler.get_detections_batch([batch[n][2] for n in shared])
+            for n, result in zip(shared, results):
+                detections[n] = result
+
+        stop = False
+        for n, (camera, frame_count, frame) in enumerate(batch):
+            stop = camera.processor.process_frame(frame, frame_count, camera.frameHandler, detections[n], reuse=not infer[n]) or stop
+            metrics.frame_done(sum(c.frameHandler.dropped_frames for c in self.cameras))
+        return stop
+
+    def run(self):
+        """Process the cameras until every capture has ended or the user stops."""
+        Print.print_info(f"Scheduling {len(self.cameras)} cameras, up to {self.batch_size} frames per detector call")
+        while self.active():
+            batch = self.collect()
+            if batch and self.process(batch):
+                break
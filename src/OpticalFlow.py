@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+
+class PigFlow:
+    def __init__(self, roi_padding=75, max_corners=30, min_points=5, refresh_interval=10):
+        """
+        Lucas-Kanade optical flow on a region around each tracked pig.
+
+        Each track keeps the grayscale image of its region and its feature points from the previous
+        frame, so only the region is converted once per frame and features are only searched again
+        when too few survive, after refresh_interval frames or when the region moves.
+
+        Args:
+            roi_padding (int): Half the side of the square region around the pig center.
+            max_corners (int): Maximum number of feature points per pig.
+            min_points (int): Search new features when fewer points are left.
+            refresh_interval (int): Search new features at least every N frames.
+        """
+        self.roi_padding = roi_padding
+        self.min_points = min_points
+        self.refresh_interval = refresh_interval
+        # Parameters for Lucas-Kanade optical flow, adjusted for smoother results
+        self.lk_params = dict(winSize=(21, 21), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+        self.feature_params = dict(maxCorners=max_corners, qualityLevel=0.3, minDistance=15, blockSize=7)  # Fewer points, more spread out
+
+        self.state = {}  # Track id -> dict(roi, gray, points, age)
+        self.vectors = {}  # Track id -> median (dx, dy) of the last update
+        self.pairs = {}  # Track id -> (old points, new points) in frame coordinates, for drawing
+
+    def _roi(self, bbox, shape):
+        x1, y1, x2, y2 = map(int, bbox)
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        return (max(0, cx - self.roi_padding), max(0, cy - self.roi_padding),
+                min(shape[1], cx + self.roi_padding), min(shape[0], cy + self.roi_padding))
+
+    @staticmethod
+    def _gray(frame, roi):
+        x1, y1, x2, y2 = roi
+        return cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+
+    def _features(self, gray):
+        points = cv2.goodFeaturesToTrack(gray, mask=None, **self.feature_params)
+        return np.empty((0, 1, 2), dtype=np.float32) if points is None else np.float32(points).reshape(-1, 1, 2)
+
+    def update(self, frame, tracks):
+        """
+        Compute the flow of every tracked pig between the previous and the current frame.
+
+        Args:
+            frame (ndarray): Current frame, before anything is drawn on it.
+            tracks (list): (track id, pig detection) pairs of the current frame.
+
+        Returns:
+            dict: Track id -> median flow vector (dx, dy) in pixels, for tracks seen on both frames.
+        """
+        self.vectors, self.pairs = {}, {}
+        state = {}
+
+        for track_id, pig in tracks:
+            roi = self._roi(pig[1], frame.shape)
+            if roi[2] <= roi[0] or roi[3] <= roi[1]:
+                continue
+            prev = self.state.get(track_id)
+
+            if prev is not None and len(prev["points"]):
+                # Flow inside the previous region, so both images cover the same pixels
+                x1, y1 = prev["roi"][:2]
+                gray = self._gray(frame, prev["roi"])
+                if gray.shape == prev["gray"].shape:
+                    p1, st, _ = cv2.calcOpticalFlowPyrLK(prev["gray"], gray, prev["points"], None, **self.lk_params)
+                    good = st.reshape(-1) == 1
+                    old, new = prev["points"][good], p1[good]
+                    if len(new):
+                        offset = np.array([x1, y1], dtype=np.float32)
+                        self.pairs[track_id] = (old.reshape(-1, 2) + offset, new.reshape(-1, 2) + offset)
+                        dx, dy = np.median((new - old).reshape(-1, 2), axis=0)
+                        self.vectors[track_id] = (float(dx), float(dy))
+
+                    # Keep the region while the pig stays well inside it
+                    moved = max(abs(a - b) for a, b in zip(roi[:2], prev["roi"][:2]))
+                    age = prev["age"] + 1
+                    if moved <= self.roi_padding // 2 and len(new) >= self.min_points and age < self.refresh_interval:
+                        state[track_id] = dict(roi=prev["roi"], gray=gray, points=new, age=age)
+                        continue
+
+            # New track, region moved or too few points left: start again on the current region
+            gray = self._gray(frame, roi)
+            state[track_id] = dict(roi=roi, gray=gray, points=self._features(gray), age=0)
+
+        # Tracks that are gone are forgotten
+        self.state = state
+        return self.vectors
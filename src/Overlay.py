@@ -2,18 +2,43 @@ import numpy as np
 import cv2
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib.pyplot as plt
+from Detections import Detections
+from UsefulMath import UMath
 
 class Overlay:
-    def __init__(self, first_frame):
+    def __init__(self, first_frame, scale=1, kernel="box", radius=10):
         """
         Initialize the heatmap with the same dimensions as the video frames.
         Args:
-            frame_shape (tuple): Shape of the video frame (height, width, channels).
+            first_frame (np.ndarray): First video frame, used for the heatmap size.
+            scale (int): Downscale factor of the heatmap grid. The grid is upsampled to the frame only for display.
+            kernel (str): 'box' adds 1 to every cell in the window, 'gaussian' adds a Gaussian weighted stamp.
+            radius (int): Radius of the stamp around each pig center, in frame pixels.
         """
-        self.heatmap = np.zeros_like(first_frame, dtype=np.float32)
-        self.z_data = np.zeros_like(first_frame[:, :, 0], dtype=np.float32)  # Store z values for 3D plot
+        self.scale = max(1, int(scale))
+        self.kernel_type = kernel
+        height, width = first_frame.shape[:2]
+        grid_shape = ((height + self.scale - 1) // self.scale, (width + self.scale - 1) // self.scale)
+
+        # A single channel is enough, the color comes from the colormap at display time
+        self.heatmap = np.zeros(grid_shape, dtype=np.float32)
+        self.z_data = self.heatmap  # Store z values for 3D plot (same counts as the heatmap)
+        self.max_value = 0.0  # Running maximum, so normalizing does not rescan the whole grid
+        self.set_radius(radius)
+
+    def set_radius(self, radius):
+        """Precompute the stamp added around each pig center."""
+        self.radius = radius
+        r = max(0, int(round(radius / self.scale)))
+        if self.kernel_type == "gaussian":
+            sigma = max(r / 2.0, 1e-6)
+            offsets = np.arange(-r, r + 1, dtype=np.float32)
+            g = np.exp(-(offsets ** 2) / (2 * sigma ** 2))
+            self.kernel = np.outer(g, g).astype(np.float32)
+        else:
+            self.kernel = np.ones((2 * r + 1, 2 * r + 1), dtype=np.float32)
+        self.kernel_radius = r
 
-    
     def get_center(self, box):
         """
         Calculate the center of a bounding box.
@@ -27,20 +52,34 @@ class Overlay:
         cy = (y1 + y2) // 2
         return int(cx), int(cy)
 
+    def updateHeatmap(self, pig_detections, radius=10):
+        if radius != self.radius:
+            self.set_radius(radius)
+
+        pig_classes = ["Pig-laying", "Pig-standing"]
+        if isinstance(pig_detections, Detections):
+            centers = UMath.get_centers(pig_detections.select(pig_classes).boxes) // self.scale
+        else:
+            centers = [self.get_center(pig[1]) for pig in pig_detections if pig[0] in pig_classes]
+            centers = [(cx // self.scale, cy // self.scale) for cx, cy in centers]
+
+        for cx, cy in centers:
+            self._add_stamp(int(cx), int(cy))
+
+    def _add_stamp(self, cx, cy):
+        """Add the kernel centered on grid cell (cx, cy), clipped to the grid borders."""
+        r = self.kernel_radius
+        height, width = self.heatmap.shape
 
-    def updateHeatmap(self, pig_detections, radius=5):
-        for pig in [det for det in pig_detections if det[0] in ["Pig-laying", "Pig-standing"]]:
-            # x1, y1, x2, y2 = map(int, pig[1])
-            pig_center = self.get_center(pig[1])
+        x0, y0 = max(0, cx - r), max(0, cy - r)
+        x1, y1 = min(width, cx + r + 1), min(height, cy + r + 1)
+        if x0 >= x1 or y0 >= y1:
+            return  # Center is completely outside the frame
 
-            # Update both heatmap and z_data
-            heatmap_radius = 10
-            for dx in range(-heatmap_radius, heatmap_radius + 1):
-                for dy in range(-heatmap_radius, heatmap_radius + 1):
-                    cx, cy = pig_center[0] + dx, pig_center[1] + dy
-                    if 0 <= cx < self.heatmap.shape[1] and 0 <= cy < self.heatmap.shape[0]:
-                        self.heatmap[cy, cx] += 1
-                        self.z_data[cy, cx] += 1  # Increment z for 3D representation
+        kernel = self.kernel[y0 - (cy - r):y1 - (cy - r), x0 - (cx - r):x1 - (cx - r)]
+        region = self.heatmap[y0:y1, x0:x1]
+        region += kernel
+        self.max_value = max(self.max_value, float(region.max()))
 
     def get_3d_data(self):
         """
@@ -48,7 +87,7 @@ class Overlay:
         Returns:
             tuple: X, Y, Z data for 3D plotting.
         """
-        y, x = np.mgrid[0:self.heatmap.shape[0], 0:self.heatmap.shape[1]]
+        y, x = np.mgrid[0:self.heatmap.shape[0], 0:self.heatmap.shape[1]] * self.scale
         z = self.z_data
         return x, y, z
 
@@ -58,8 +97,8 @@ class Overlay:
         Returns:
             np.ndarray: Normalized heatmap.
         """
-        if np.max(self.heatmap) > 0:
-            return np.uint8(np.clip(self.heatmap / np.max(self.heatmap) * 255, 0, 255))
+        if self.max_value > 0:
+            return cv2.convertScaleAbs(self.heatmap, alpha=255.0 / self.max_value)
         return np.zeros_like(self.heatmap, dtype=np.uint8)
 
     def apply_to_frame(self, frame, alpha=0.7):
@@ -76,6 +115,15 @@ class Overlay:
 
         return cv2.addWeighted(frame, alpha, heatmap_display, 1 - alpha, 0)
 
+    def save_heatmap(self, output_file):
+        """
+        Save the accumulated heatmap grid (one cell per scale x scale pixels) as a .npy file.
+
+        Args:
+            output_file (str): Path of the .npy file.
+        """
+        np.save(output_file, self.heatmap)
+
     def convert_to_grayscale(self, frame):
         """
         Convert a video frame to grayscale.
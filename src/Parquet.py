@@ -0,0 +1,151 @@
+import os
+import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed when the Parquet output is enabled
+    pa = None
+    pq = None
+
+# Fixed frame rate used for the times, the same as the CSV output
+FPS = 24.0
+
+
+def event_schema():
+    """Arrow schema of one behaviour event. Pen and day are stored in the partition path."""
+    return pa.schema([
+        ("video", pa.string()),
+        ("pig_id", pa.int32()),
+        ("start_frame", pa.int64()),
+        ("end_frame", pa.int64()),
+        ("start_time_min", pa.float64()),
+        ("end_time_min", pa.float64()),
+        ("behavior", pa.dictionary(pa.int8(), pa.string())),
+        ("drinking_duration", pa.float64()),
+        ("pig_x", pa.int32()), ("pig_y", pa.int32()), ("pig_conf", pa.float32()),
+        ("faucet1_x", pa.int32()), ("faucet1_y", pa.int32()), ("faucet1_conf", pa.float32()),
+        ("faucet2_x", pa.int32()), ("faucet2_y", pa.int32()), ("faucet2_conf", pa.float32()),
+        ("feces_x", pa.int32()), ("feces_y", pa.int32()), ("feces_conf", pa.float32()),
+    ])
+
+
+class ParquetLogger:
+    def __init__(self, output_root, pen, video, day=None, row_group_size=1024):
+        """
+        Write behaviour events as typed columns to a Hive partitioned Parquet dataset:
+        <output_root>/pen=<pen>/day=<YYYY-MM-DD>/<video>.parquet
+
+        Events are written to numbered part files (<video>.part-0000.parquet, ...) that are joined into
+        <video>.parquet on close(). A checkpoint() finishes the current part, so a resumed run can drop
+        the parts written after its checkpoint and keep the ones before it.
+
+        Args:
+            output_root (str): Root folder of the dataset.
+            pen (str): Pen name used as the first partition key.
+            video (str): Name of the video the events come from (one file per video).
+            day (str or date): Recording day used as the second partition key. Defaults to today.
+            row_group_size (int): Number of events buffered before a row group is written.
+        """
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+
+        if day is None:
+            day = datetime.date.today()
+        if isinstance(day, datetime.date):
+            day = day.isoformat()
+
+        self.video = video
+        self.row_group_size = max(1, row_group_size)
+        self.schema = event_schema()
+        self.columns = {name: [] for name in self.schema.names}
+        self.buffered = 0
+
+        folder = os.path.join(output_root, f"pen={pen}", f"day={day}")
+        os.makedirs(folder, exist_ok=True)
+        self.filename = os.path.join(folder, f"{os.path.splitext(video)[0]}.parquet")
+        self.part = 0  # Number of the part file the next row group goes to
+        self.writer = None  # Opened on the first row group so empty videos leave no file
+
+    def part_filename(self, part):
+        return f"{os.path.splitext(self.filename)[0]}.part-{part:04d}.parquet"
+
+    def log_behavior(self, loggerMessage):
+        """Buffer one behaviour event from a loggerMessage (same input as CSVLogger.log_behavior)."""
+        start_frame = loggerMessage.get("start_frame")
+        end_frame = loggerMessage.get("end_frame")
+        coordinates = loggerMessage.get("coordinates", {})
+        confidences = dict(zip(loggerMessage.get("class", []), loggerMessage.get("confidence", [])))
+
+        row = {
+            "video": self.video,
+            "pig_id": loggerMessage.get("pig_id"),
+            "start_frame": start_frame,
+            "end_frame": end_frame,
+            "start_time_min": start_frame / FPS / 60.0,
+            "end_time_min": end_frame / FPS / 60.0,
+            "behavior": loggerMessage.get("behavior"),
+            "drinking_duration": (end_frame - start_frame) / FPS,
+        }
+        for name in ("pig", "faucet1", "faucet2", "feces"):
+            center = coordinates.get(name)
+            row[f"{name}_x"] = int(center[0]) if center is not None else None
+            row[f"{name}_y"] = int(center[1]) if center is not None else None
+            row[f"{name}_conf"] = confidences.get(name)
+
+        for name, value in row.items():
+            self.columns[name].append(value)
+        self.buffered += 1
+
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events as one row group."""
+        if self.buffered == 0:
+            return
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.part_filename(self.part), self.schema)
+        self.writer.write_table(table, row_group_size=self.buffered)
+        self.columns = {name: [] for name in self.schema.names}
+        self.buffered = 0
+
+    def _finish_part(self):
+        """Write the remaining events and the footer of the current part file."""
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.part += 1
+
+    def checkpoint(self):
+        """Finish the current part so every event logged so far is readable after a crash. Returns the sink state."""
+        self._finish_part()
+        return {"parts": self.part}
+
+    def restore(self, state):
+        """Drop the part files written after the checkpoint state and continue after the ones before it."""
+        self.part = state["parts"]
+        self._remove_parts(self.part)
+
+    def _remove_parts(self, first):
+        """Remove the part files from number first on, e.g. left behind by an interrupted run."""
+        part = first
+        while os.path.exists(self.part_filename(part)):
+            os.remove(self.part_filename(part))
+            part += 1
+
+    def close(self):
+        """Write the remaining events and join the part files into <video>.parquet."""
+        self._finish_part()
+        parts = [self.part_filename(part) for part in range(self.part) if os.path.exists(self.part_filename(part))]
+        if len(parts) == 1:
+            os.replace(parts[0], self.filename)
+        elif parts:
+            with pq.ParquetWriter(self.filename, self.schema) as writer:
+                for part in parts:
+                    writer.write_table(pq.read_table(part, schema=self.schema))
+            for part in parts:
+                os.remove(part)
+        self._remove_parts(self.part)
@@ -1,177 +1,218 @@
 from UsefulMath import UMath
-from ModelHandler import ModelHandler
+from ModelHandler import ModelHandler, BEHAVIOR_MODEL
+from Detections import Detections
+from Tracker import PigTracker
 from Print import Print
+from Metrics import metrics
+import numpy as np
 import cv2  # Import cv2 for image manipulation and display
 
 class PigMaps:
-    def __init__(self):
+    def __init__(self, device=None, behavior_crop=False, behavior_imgsz=320, behavior_crop_padding=40, faucet_roi=None, model_names=None):
+        """
+        Args:
+            device (str): Device to run the models on, or None for the default.
+            behavior_crop (bool): Run the behaviour model on the padded pig crop instead of the full frame.
+            behavior_imgsz (int): Model input size used for the pig crop.
+            behavior_crop_padding (int): Percentage the pig box is enlarged by before cropping.
+            faucet_roi (FaucetROI): Drinking zones to run the detector on once the faucets are known, or None for the full frame.
+            model_names (tuple): (detector names, behaviour names) to replay a detection cache without loading the models.
+        """
         self.umath = UMath()
-        self.model_handler = ModelHandler()  # Use ModelHandler instance for detections
-        self.model_handler_behavior = ModelHandler("yolo11.pt")
+        # Models are loaded once per process and shared between PigMaps instances
+        detector_names, behavior_names = model_names if model_names is not None else (None, None)
+        self.model_handler = ModelHandler(device=device, names=detector_names)  # Use ModelHandler instance for detections
+        self.model_handler_behavior = ModelHandler(BEHAVIOR_MODEL, device=device, names=behavior_names)
         self.behavior = None
         self.frame_count = 0  # Initialize frame count
 
-    def detect_behavior(self, img):
+        # Every pig gets a stable track id; movement state is kept per track
+        self.tracker = PigTracker(self.umath.MOVEMENT_THRESHOLD, self.umath.STANDING_THRESHOLD)
+        self.tracks = []  # (track id, pig detection) for every pig in the current frame
+        self.track_behaviors = {}  # Behaviour of each track in the current frame
+
+        self.behavior_crop = behavior_crop
+        self.behavior_imgsz = behavior_imgsz
+        self.behavior_crop_padding = behavior_crop_padding
+        # Behaviour model results for the current frame, so it runs at most once per frame (per pig crop)
+        self.behavior_results = {}
+        self.behavior_results_frame = None
+        # Behaviour model results of the current frame replayed from a DetectionCache, keyed like behavior_detections_all()
+        self.cached_behavior = None
+
+        self.faucet_roi = faucet_roi
+
+    def get_detections(self, img):
+        """Detector output for one frame, from the faucet tiles once they are stable or the full frame otherwise."""
+        return self.get_detections_batch([img])[0]
+
+    def get_detections_batch(self, imgs):
+        """Detector output for several frames in one call, from the faucet tiles once they are stable or the full frames otherwise."""
+        with metrics.timer("detector"):
+            if self.faucet_roi is not None and self.faucet_roi.stable:
+                return self.model_handler.get_detections_tiles(imgs, self.faucet_roi.tiles(imgs[0].shape))
+            if len(imgs) == 1:
+                return [self.model_handler.get_detections(imgs[0])]
+            return self.model_handler.get_detections_batch(imgs)
+
+    def detect_behavior(self, img, detections=None):
         self.frame_count += 1
         """
         Detect pig behaviors like drinking or pooping based on proximity (IoU) and movement angle.
         Returns detections and behavior information, along with coordinates for drawing.
+        Pass detections when the detector has already been run on this frame (e.g. as part of a batch).
+        Every pig is tracked; self.tracks holds the (track id, detection) pairs of this frame.
         """
         # Get detections from the YOLO model
-        detections = self.model_handler.get_detections(img)
-        
-        # Filter and sort detections based on confidence and center (if needed)
-        pigs = sorted(self.model_handler.get_pig_detection(detections), key=lambda x: x[2], reverse=True)
-        faucets = sorted(self.model_handler.get_faucet_detection(detections), key=lambda x: (x[2], x[1]), reverse=True)  # Sort by confidence, then by center
-        feces = sorted(self.model_handler.get_feces_detection(detections), key=lambda x: (x[2], x[1]), reverse=True)  # Sort by confidence, then by center
-        
-        # Resize the bounding boxes for faucets
-        resized_faucets = []
-        for faucet in faucets:
-            class_name, bbox, confidence = faucet
-            resized_bbox = self.umath.resize_bbox(160, bbox)  # 100% increase in size
-            resized_faucets.append((class_name, resized_bbox, confidence))
-        
-        # Use the resized faucets for further processing
-        faucets = resized_faucets
+        if detections is None:
+            detections = self.get_detections(img)
+        elif not isinstance(detections, Detections):
+            detections = Detections.from_tuples(detections, self.model_handler.names)
+
+        # Filter and sort detections based on confidence
+        pigs = self.model_handler.get_pig_detection(detections).sorted_by_confidence()
+        faucets = self.model_handler.get_faucet_detection(detections).sorted_by_confidence()
+        feces = self.model_handler.get_feces_detection(detections).sorted_by_confidence()
+
+        # Learn the faucet positions from the full-frame detections until they are stable
+        if self.faucet_roi is not None and not self.faucet_roi.stable:
+            self.faucet_roi.observe(faucets.boxes)
+
+        # Resize the bounding boxes for faucets and use the resized faucets for further processing
+        faucets = faucets.with_boxes(self.umath.resize_bboxes(160, faucets.boxes))  # 100% increase in size
 
 
         # Select top detections
-        top_pig = pigs[:1]  # Highest confidence pig
         top_faucets = faucets[:2]  # Up to 2 faucets with highest confidence
         top_feces = feces[:1]  # Highest confidence feces
 
-        movement_vector = (0, 0)  # Default movement vector if no pigs are detected
-        # self.do_drinking_detection(img,top_pig,faucet)
+        # Associate every pig with a track, highest confidence first
+        with metrics.timer("geometry"):
+            track_ids = self.tracker.update(pigs)
+        self.tracks = list(zip(track_ids.tolist(), pigs))
 
-        # Process each pig detection
-        if top_pig:  # Only process if there are pigs detected
-            for pig in top_pig:  # Only process the pig with the highest confidence
-                pig_id, pig_box, pig_confidence = pig
-                pig_center = self.umath.get_center(pig_box)
-
-                prev_center = self.umath.get_prev_center(pig_id)
-                movement_vector = self.umath._calculate_movement_vector(pig_id, prev_center, pig_center)
-                
-                # Detect behaviors based on interaction with faucets
-                self._detect_pig_behavior(img, pig_center, pig_box, movement_vector, top_faucets, pig_confidence, pig_id)
-                # self.umath.update_prev_movement_vector(movement_vector, pig_center, pig_id)
+        # Movement of the highest confidence pig, (0, 0) if no pigs are detected
+        movement_vector = self.tracker.movement_vector(self.tracks[0][0]) if self.tracks else (0, 0)
 
         # Return filtered detections and behavior details
-        return top_faucets, top_feces, top_pig, movement_vector, self.behavior
-
-    def _detect_pig_behavior(self, img, pig_center, pig_box, movement_vector, faucets, pig_confidence, pig_id):
-        """Detect drinking behavior by checking IoU, movement vector magnitude, and using the behavior model."""
-        for faucet in faucets:
-            faucet_box = faucet[1]
-            faucet_center = self.umath.get_center(faucet_box)
-            # Calculate behavior criteria for drinking
-            iou = self.umath.calculate_iou(pig_box, faucet_box)
-            dot_product = self.umath.calculate_dot_product(
-                movement_vector, (faucet_center[0] - pig_center[0], faucet_center[1] - pig_center[1])
-            )
-            is_standing = self.umath.is_standing(pig_id, movement_vector)
-            
-            # Print.print_detection_requirements(iou, dot_product, is_standing, pig_confidence)
-            if iou > 0.0035 and is_standing == True and pig_confidence > 0.45:
-                # Crop the image to the pig's bounding box for behavior detection
-                results = self.model_handler_behavior.get_detections(img)
-                
-                # # Annotate the cropped image with detection results
-                # annotated_img = img.copy()
-                # for result in results:
-                #     class_name, bbox, confidence = result
-                #     x1, y1, x2, y2 = map(int, bbox)
-                #     color = (0, 255, 0) if class_name == "Drinking" else (0, 0, 255)  # Green for Drinking, Red for others
-                #     cv2.rectangle(annotated_img, (x1, y1), (x2, y2), color, 2)
-                #     cv2.putText(annotated_img, f"{class_name}: {confidence:.2f}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                # # Show the annotated image and wait for input
-                # cv2.imshow('Cropped Pig Behavior Detection', annotated_img)
-                # cv2.waitKey(0)  # Wait indefinitely for a key press
-                # cv2.destroyAllWindows()
-                
-                # Check if drinking is detected with sufficient confidence
-                drinking_detected = False
-                for result in results:
-                    class_name, _, confidence = result
-                    if class_name == "Drinking" and confidence > 0.85:
-                        drinking_detected = True
-                    elif class_name == "Idle" and confidence >= 0.5:  # If idle is detected with equal or higher confidence, we don't consider it drinking
-                        drinking_detected = False
-                        break
-                
-                if drinking_detected:
-                    self.behavior = "Drinking"
-                    break  # No need to check other faucets once drinking behavior is detected
-               
-            self.behavior = "Idle"
-            # print(self.behavior)
-            # cv2.waitKey(0)
+        return top_faucets, top_feces, pigs, movement_vector, self.behavior
+
+    def get_behavior_detections(self, img, pig_box, pig_index=None):
+        """
+        Run the behaviour model for the current frame, reusing the result if it has already run.
 
+        Args:
+            img (ndarray): Current frame.
+            pig_box (list): Bounding box of the pig, used when behaviour_crop is enabled.
+            pig_index (int): Index of the pig in confidence order, used to look up cached_behavior.
+
+        Returns:
+            Detections: Behaviour detections in frame coordinates.
+        """
+        names = self.model_handler_behavior.names
+        if self.cached_behavior is not None:
+            # Replayed from a detection cache: pigs without a recorded result had no behaviour detections
+            key = pig_index if self.behavior_crop else None
+            return self.cached_behavior.get(key) or Detections([], [], [], names)
+
+        # Results only stay valid for the frame they were computed on
+        if self.behavior_results_frame != self.frame_count:
+            self.behavior_results = {}
+            self.behavior_results_frame = self.frame_count
+
+        if not self.behavior_crop:
+            if None not in self.behavior_results:
+                with metrics.timer("behavior"):
+                    self.behavior_results[None] = self.model_handler_behavior.get_detections(img)
+            return self.behavior_results[None]
+
+        # Pad the pig box so the faucet next to its head is in the crop, and keep it inside the frame
+        x_min, y_min, x_max, y_max = self.umath.resize_bbox(self.behavior_crop_padding, pig_box)
+        height, width = img.shape[:2]
+        crop_box = (max(0, x_min), max(0, y_min), min(width, x_max), min(height, y_max))
+
+        if crop_box not in self.behavior_results:
+            crop = self.umath.crop_image_to_bbox(img, crop_box)
+            if crop.size == 0:
+                self.behavior_results[crop_box] = Detections([], [], [], names)
+            else:
+                with metrics.timer("behavior"):
+                    results = self.model_handler_behavior.get_detections(crop, imgsz=self.behavior_imgsz)
+                # Map the boxes back to frame coordinates
+                self.behavior_results[crop_box] = results.offset(crop_box[0], crop_box[1])
+        return self.behavior_results[crop_box]
+
+    def behavior_detections_all(self, img, pigs, faucets):
+        """
+        Behaviour model results for every pig that could pass model 1 with any thresholds, e.g. to record
+        them in a detection cache. Results already computed for this frame are reused.
+
+        Returns:
+            dict: Detections per pig index in confidence order, or under None for the full frame.
+        """
+        if not pigs or not faucets:
+            return {}
+        if not self.behavior_crop:
+            return {None: self.get_behavior_detections(img, None)}
+        return {p: self.get_behavior_detections(img, box) for p, box in enumerate(pigs.boxes.tolist())}
+
+    @staticmethod
+    def _is_drinking(results):
+        """
+        Check if drinking is detected with sufficient confidence in the behaviour model results.
+        Idle detected with 0.5 or more confidence overrules any drinking detection.
+        """
+        drinking = results.select(["Drinking"]).confidences
+        idle = results.select(["Idle"]).confidences
+        return bool((drinking > 0.85).any() and not (idle >= 0.5).any())
 
     def do_drinking_detection(self, img, best_pig_detection, best_faucet_detection):
+        """
+        Decide per tracked pig whether it is drinking. best_pig_detection and best_faucet_detection
+        must be the Detections returned by detect_behavior for this frame, so the pigs line up with self.tracks.
+        The per-track result is stored in self.track_behaviors.
+        """
         model1_drinking_detected = False
         model2_drinking_detected = False
-        pig_center =None
-        pig_id=None
-        movement_vector=None
+        pig_confidence = None
+        faucet_confidence = None
+        self.track_behaviors = {track_id: "Idle" for track_id, _ in self.tracks}
 
         # Resize the bounding boxes for faucets ( bigger hot zone)
-        resized_faucets = []
-        for faucet in best_faucet_detection:
-            class_name, bbox, confidence = faucet
-            resized_bbox = self.umath.resize_bbox(160, bbox)  # 160% increase in size
-            resized_faucets.append((class_name, resized_bbox, confidence))
-        
-        # Use the resized faucets for further processing
-        best_faucet_detection = resized_faucets
-        for faucet in best_faucet_detection:
-            faucet_name, faucet_box, faucet_confidence = faucet
-
-            for pig in best_pig_detection:
-                pig_id, pig_box, pig_confidence = pig
-
-                # Calculate IOU and Movement vector magnitude
-                iou = self.umath.calculate_iou(pig_box, faucet_box)
-                prev_center = self.umath.get_prev_center(pig_id)
-                pig_center = self.umath.get_center(pig_box)
-                movement_vector = self.umath._calculate_movement_vector(pig_id, prev_center, pig_center)
-                is_standing = self.umath.is_standing(pig_id, movement_vector)
-
-                # Print.print_do_detection_requirements(iou, is_standing, pig_confidence, faucet_confidence)
-                
-                # Model 1 check
-                if iou > 0.0035 and is_standing == True and pig_confidence > 0.45 and faucet_confidence > 0.80:
-                    model1_drinking_detected = True
-
-                    results = self.model_handler_behavior.get_detections(img)
-                    
-                    # Check if model 2 drinking is detected with sufficient confidence
-                    model2_drinking_detected = False
-                    for result in results:
-                        class_name, _, confidence = result
-                        if class_name == "Drinking" and confidence > 0.85:
-                            model2_drinking_detected = True
-                        elif class_name == "Idle" and confidence >= 0.5:  # If idle is detected with equal or higher confidence, we don't consider it drinking
-                            model2_drinking_detected = False
-                            break
-                    
-                    if model2_drinking_detected:
-                        self.behavior = "Drinking"
-                        break  # No need to check other pigs for this faucet if drinking is detected
-
-
-            # If we've broken out of the inner loop due to drinking detection, we don't need to continue checking other faucets
-            if self.behavior == "Drinking":
-                break
-
-        # If no drinking was detected, set behavior to Idle
-        if self.behavior != "Drinking":
-            self.behavior = "Idle"
-
-        print("Model 1:", model1_drinking_detected, "  Model2:", model2_drinking_detected)
-        self.umath.update_prev_movement_vector(movement_vector, pig_center, pig_id)
-
-        # Assuming you want to return the last pig and faucet checked or the one where drinking was detected
-        return model1_drinking_detected, model2_drinking_detected, pig_confidence, faucet_confidence, self.behavior
\ No newline at end of file
+        faucet_boxes = self.umath.resize_bboxes(160, best_faucet_detection.boxes)  # 160% increase in size
+
+        if best_pig_detection and best_faucet_detection:
+            track_ids = np.array([track_id for track_id, _ in self.tracks])
+            standing = self.tracker.standing[self.tracker.rows(track_ids)]
+            pig_boxes = best_pig_detection.boxes
+            pig_confidences = best_pig_detection.confidences
+            faucet_confidences = best_faucet_detection.confidences
+
+            # Model 1 check for every pig/faucet pair at once
+            with metrics.timer("geometry"):
+                iou = self.umath.iou_matrix(pig_boxes, faucet_boxes)
+                model1 = ((iou > 0.0035) & standing[:, None] &
+                          (pig_confidences[:, None] > 0.45) & (faucet_confidences[None, :] > 0.80))
+            model1_pigs = model1.any(axis=1)
+            model1_drinking_detected = bool(model1_pigs.any())
+
+            # Model 2 (behaviour model) only for the pigs that passed model 1
+            for p in np.flatnonzero(model1_pigs):
+                track_id, (pig_id, pig_box, confidence) = self.tracks[p]
+                if self._is_drinking(self.get_behavior_detections(img, pig_box, p)):
+                    model2_drinking_detected = True
+                    self.track_behaviors[track_id] = "Drinking"
+                    pig_confidence = confidence
+                    faucet_confidence = float(faucet_confidences[np.argmax(iou[p] * model1[p])])
+
+            # Report the top pig and faucet if no pig was found drinking
+            if pig_confidence is None:
+                pig_confidence = float(pig_confidences[0])
+                faucet_confidence = float(faucet_confidences[0])
+
+        self.behavior = "Drinking" if model2_drinking_detected else "Idle"
+
+        Print.print_debug(f"Model 1: {model1_drinking_detected}   Model2: {model2_drinking_detected}")
+
+        # Return the pig and faucet where drinking was detected, or the top ones otherwise
+        return model1_drinking_detected, model2_drinking_detected, pig_confidence, faucet_confidence, self.behavior
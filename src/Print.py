@@ -1,24 +1,52 @@
+import logging
+
+# Levelled logger behind every Print method, so per-frame messages cost nothing unless enabled
+logger = logging.getLogger("pigmaps")
+
+
 class Print:
+    @staticmethod
+    def configure(level="INFO"):
+        """
+        Set up the output of the logger once at startup.
+
+        Args:
+            level (str): Lowest level that is written, e.g. 'DEBUG', 'INFO', 'WARNING' or 'ERROR'.
+        """
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+            logger.addHandler(handler)
+            logger.propagate = False
+        logger.setLevel(level.upper())
+
     @staticmethod
     def print_error(message):
         """
         Print an error message.
         """
-        print(f"Error: {message}")
+        logger.error(message)
+
+    @staticmethod
+    def print_warning(message):
+        """
+        Print a warning message.
+        """
+        logger.warning(message)
 
     @staticmethod
     def print_info(message):
         """
         Print an informational message.
         """
-        print(f"Info: {message}")
+        logger.info(message)
 
     @staticmethod
     def print_debug(message):
         """
         Print a debug message.
         """
-        print(f"Debug: {message}")
+        logger.debug(message)
 
     @staticmethod
     def print_behavior_detected(frame_count, behavior, pig_id=None):
@@ -26,9 +54,9 @@ class Print:
         Print a message when a behavior is detected.
         """
         if pig_id is not None:
-            print(f"Frame {frame_count}: {behavior} detected for Pig ID {pig_id}.")
+            logger.info(f"Frame {frame_count}: {behavior} detected for Pig ID {pig_id}.")
         else:
-            print(f"Frame {frame_count}: {behavior} detected.")
+            logger.info(f"Frame {frame_count}: {behavior} detected.")
 
     @staticmethod
 
@@ -36,18 +64,24 @@ class Print:
         """
         Print the detection criteria for pig behavior from _detect_pig_behavior function.
         """
-        print(f"Behavior Detection Criteria:")
-        print(f"  IoU: {iou:.4f}")
-        print(f"  Dot Product: {dot_product:.4f}")
-        print(f"  Is Standing: {is_standing}")
-        print(f"  Pig Confidence: {pig_confidence:.4f}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Behavior Detection Criteria:\n"
+                         f"  IoU: {iou:.4f}\n"
+                         f"  Dot Product: {dot_product:.4f}\n"
+                         f"  Is Standing: {is_standing}\n"
+                         f"  Pig Confidence: {pig_confidence:.4f}")
     @staticmethod
     def print_do_detection_requirements(iou, is_standing, pig_confidence, faucet_confidence):
         """
         Print the detection criteria for pig behavior from do_drinking_detection function.
         """
-        print(f"Do Detection Criteria:")
-        print(f"  IoU: {iou:.4f}")
-        print(f"  Is Standing: {is_standing}")
-        print(f"  Pig Confidence: {pig_confidence:.4f}")
-        print(f"  Faucet Confidence: {faucet_confidence:.4f}")
\ No newline at end of file
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Do Detection Criteria:\n"
+                         f"  IoU: {iou:.4f}\n"
+                         f"  Is Standing: {is_standing}\n"
+                         f"  Pig Confidence: {pig_confidence:.4f}\n"
+                         f"  Faucet Confidence: {faucet_confidence:.4f}")
+
+
+# Default output until main sets the level from the command line
+Print.configure()
@@ -0,0 +1,308 @@
+"""
+Threshold sweep of the drinking rules of PigMaps.do_drinking_detection on detection caches.
+
+Per-pig features are extracted once from the caches written with --detection-cache: the IoU with
+each of the two top faucets, the pig and faucet confidences, the movement change used for the
+standing test and the behaviour model scores. Every combination of thresholds is then evaluated
+in one vectorized pass and scored per labelled segment, the same way confusion.predicted marks a
+segment as drinking when any of its frames is.
+
+Labels are a CSV file with the columns video,start_frame,end_frame,drinking (0 or 1); video is
+the file name of the recording.
+
+Usage:
+    python src/Sweep.py --detection-cache cache --labels labels.csv --iou 0.002 0.0035 0.005 \\
+        --drinking-conf 0.75 0.85 0.9 --workers 4 --output sweep.csv
+"""
+import os
+import csv
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from UsefulMath import UMath
+from Tracker import PigTracker
+from DetectionCache import DetectionCache
+from Print import Print
+
+PARAMETERS = ("iou", "pig_conf", "faucet_conf", "drinking_conf", "idle_conf", "standing")
+# Thresholds currently used by PigMaps and the tracker, in PARAMETERS order
+DEFAULTS = (0.0035, 0.45, 0.80, 0.85, 0.5, 10.0)
+FEATURES = ("video", "frame", "iou", "faucet_conf", "pig_conf", "standing", "drinking", "idle")
+# Upper bound of pig rows x parameter sets evaluated at once, to bound the memory of one chunk
+MAX_CELLS = 20_000_000
+
+
+def _max_confidence(results, name):
+    """Highest confidence of a class in behaviour results, -1 if there is none."""
+    if results is None:
+        return -1.0
+    confidences = results.select([name]).confidences
+    return float(confidences.max()) if len(confidences) else -1.0
+
+
+def extract_features(cache, video=0):
+    """
+    Per-pig features of every frame of a detection cache, computed the way PigMaps and the tracker do.
+
+    Args:
+        cache (DetectionCache): Cache of one video.
+        video (int): Index of the video, stored with every row.
+
+    Returns:
+        dict: One array per name in FEATURES, one row per pig and frame.
+    """
+    umath = UMath()
+    tracker = PigTracker(umath.MOVEMENT_THRESHOLD, umath.STANDING_THRESHOLD)
+    rows = {name: [] for name in FEATURES}
+    last = None
+
+    for frame_count, cached in cache:
+        if cached is None:
+            # The motion gate reused the previous results for this frame
+            if last is not None:
+                last = dict(last, frame=np.full(len(last["frame"]), frame_count, dtype=np.int64))
+                for name in FEATURES:
+                    rows[name].append(last[name])
+            continue
+
+        detections = cached.detections
+        pigs = detections.select(["Pig-laying", "Pig-standing"]).sorted_by_confidence()
+        faucets = detections.select(["Water-faucets"]).sorted_by_confidence()[:2]
+        tracker.update(pigs)
+        count = len(pigs)
+
+        # Faucet boxes are enlarged in detect_behavior and once more in do_drinking_detection
+        faucet_boxes = umath.resize_bboxes(160, umath.resize_bboxes(160, faucets.boxes))
+        iou = np.zeros((count, 2), dtype=np.float32)
+        faucet_conf = np.full((count, 2), -1.0, dtype=np.float32)  # Missing faucets never pass
+        if count and len(faucets):
+            iou[:, :len(faucets)] = umath.iou_matrix(pigs.boxes, faucet_boxes)
+            faucet_conf[:, :len(faucets)] = faucets.confidences
+
+        # A pig is standing if both its movement change and its optical flow are below the threshold
+        flow = np.linalg.norm(cached.flow, axis=1) if len(cached.flow) == count else np.full(count, np.nan)
+        standing = np.maximum(tracker.frame_change, np.nan_to_num(flow, nan=0.0))
+
+        # Full-frame behaviour results apply to every pig, crop results to their own pig
+        frame_results = cached.behavior.get(None)
+        behavior = [frame_results if frame_results is not None else cached.behavior.get(p) for p in range(count)]
+
+        last = {
+            "video": np.full(count, video, dtype=np.int32),
+            "frame": np.full(count, frame_count, dtype=np.int64),
+            "iou": iou,
+            "faucet_conf": faucet_conf,
+            "pig_conf": pigs.confidences.astype(np.float32),
+            "standing": standing.astype(np.float32),
+            "drinking": np.array([_max_confidence(r, "Drinking") for r in behavior], dtype=np.float32),
+            "idle": np.array([_max_confidence(r, "Idle") for r in behavior], dtype=np.float32),
+        }
+        for name in FEATURES:
+            rows[name].append(last[name])
+
+    empty = {"iou": np.zeros((0, 2)), "faucet_conf": np.zeros((0, 2))}
+    return {name: np.concatenate(rows[name]) if rows[name] else empty.get(name, np.zeros(0)) for name in FEATURES}
+
+
+def load_caches(cache_dir):
+    """
+    Extract the features of every cache in a --detection-cache folder.
+
+    Returns:
+        tuple: (features, videos) with the file name of each video index.
+    """
+    features, videos = [], []
+    for entry in sorted(os.listdir(cache_dir)):
+        folder = os.path.join(cache_dir, entry)
+        if not DetectionCache.exists(folder):
+            continue
+        cache = DetectionCache(folder)
+        Print.print_info(f"Extracting features of {os.path.basename(cache.meta['video'])} ({len(cache)} frames)")
+        features.append(extract_features(cache, len(videos)))
+        videos.append(os.path.basename(cache.meta["video"]))
+    if not features:
+        raise FileNotFoundError(f"Error: No detection caches found in {cache_dir}.")
+    return {name: np.concatenate([f[name] for f in features]) for name in FEATURES}, videos
+
+
+def load_labels(labels_file):
+    """Labelled segments as (video file name, start_frame, end_frame, drinking) tuples."""
+    with open(labels_file, 'r', newline='') as file:
+        return [(os.path.basename(row["video"]), int(row["start_frame"]), int(row["end_frame"]), int(row["drinking"]))
+                for row in csv.DictReader(file)]
+
+
+def label_rows(features, videos, labels):
+    """
+    Keep the rows that fall inside a labelled segment, sorted by segment.
+
+    Returns:
+        dict: The features plus "segment" and "starts" (first row of each run of one segment), and
+              "labels": (S,) bool truth of every segment, also those without any pig rows.
+    """
+    segment = np.full(len(features["frame"]), -1, dtype=np.int64)
+    for video, name in enumerate(videos):
+        spans = sorted((start, end, n) for n, (v, start, end, _) in enumerate(labels) if v == name)
+        if not spans:
+            continue
+        starts, ends, ids = (np.array(column, dtype=np.int64) for column in zip(*spans))
+        rows = np.flatnonzero(features["video"] == video)
+        index = np.searchsorted(starts, features["frame"][rows], side="right") - 1
+        inside = (index >= 0) & (features["frame"][rows] < ends[np.maximum(index, 0)])
+        segment[rows[inside]] = ids[index[inside]]
+
+    keep = np.flatnonzero(segment >= 0)
+    order = keep[np.argsort(segment[keep], kind="stable")]
+    labelled = {name: features[name][order] for name in FEATURES}
+    labelled["segment"] = segment[order]
+    labelled["starts"] = np.flatnonzero(np.r_[True, np.diff(labelled["segment"]) != 0]) if len(order) else np.zeros(0, dtype=np.int64)
+    labelled["labels"] = np.array([drinking for _, _, _, drinking in labels], dtype=bool)
+    return labelled
+
+
+def make_grid(values):
+    """
+    Every combination of thresholds.
+
+    Args:
+        values (dict): Parameter name -> list of values; missing parameters keep their default.
+
+    Returns:
+        ndarray: (G, len(PARAMETERS)) parameter sets.
+    """
+    axes = [values.get(name) or [default] for name, default in zip(PARAMETERS, DEFAULTS)]
+    return np.array(list(itertools.product(*axes)), dtype=np.float64).reshape(-1, len(PARAMETERS))
+
+
+def evaluate(features, grid):
+    """
+    Score parameter sets against the labelled segments in one vectorized pass.
+
+    Mirrors do_drinking_detection: model 1 needs a faucet with IoU and confidence above the
+    thresholds, a standing pig and a confident pig; model 2 needs a confident Drinking score
+    without an Idle score at or above the idle threshold.
+
+    Args:
+        features (dict): Labelled features from label_rows().
+        grid (ndarray): (G, len(PARAMETERS)) parameter sets.
+
+    Returns:
+        dict: tp, fp, fn and tn per parameter set as (G,) arrays.
+    """
+    iou, pig_conf, faucet_conf, drinking_conf, idle_conf, standing = grid.T
+    f = features
+
+    near_faucet = ((f["iou"][:, :, None] > iou) & (f["faucet_conf"][:, :, None] > faucet_conf)).any(axis=1)
+    model1 = near_faucet & (f["standing"][:, None] < standing) & (f["pig_conf"][:, None] > pig_conf)
+    model2 = (f["drinking"][:, None] > drinking_conf) & ~(f["idle"][:, None] >= idle_conf)
+
+    # A segment is predicted as drinking if any pig in any of its frames is
+    truth = f["labels"]
+    predicted = np.zeros((len(truth), len(grid)), dtype=bool)
+    if len(f["starts"]):
+        predicted[f["segment"][f["starts"]]] = np.logical_or.reduceat(model1 & model2, f["starts"], axis=0)
+
+    truth = truth[:, None]
+    return {
+        "tp": (predicted & truth).sum(axis=0),
+        "fp": (predicted & ~truth).sum(axis=0),
+        "fn": (~predicted & truth).sum(axis=0),
+        "tn": (~predicted & ~truth).sum(axis=0),
+    }
+
+
+# Labelled features of a worker process, set once by _init_worker
+_worker_features = None
+
+
+def _init_worker(features):
+    global _worker_features
+    _worker_features = features
+
+
+def _evaluate_chunk(grid):
+    return evaluate(_worker_features, grid)
+
+
+def sweep(features, grid, workers=1):
+    """
+    Evaluate a grid in chunks that fit in memory, over a process pool if workers > 1.
+
+    Returns:
+        dict: tp, fp, fn, tn, precision, recall and f1 per parameter set.
+    """
+    rows = max(1, len(features["pig_conf"]) * 2)
+    chunk_size = max(1, MAX_CELLS // rows)
+    chunks = [grid[start:start + chunk_size] for start in range(0, len(grid), chunk_size)]
+
+    if workers <= 1 or len(chunks) == 1:
+        results = [evaluate(features, chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features,)) as executor:
+            results = list(executor.map(_evaluate_chunk, chunks))
+
+    scores = {name: np.concatenate([r[name] for r in results]) for name in ("tp", "fp", "fn", "tn")}
+    tp, fp, fn = (scores[name].astype(np.float64) for name in ("tp", "fp", "fn"))
+    scores["precision"] = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=tp + fp > 0)
+    scores["recall"] = np.divide(tp, tp + fn, out=np.zeros_like(tp), where=tp + fn > 0)
+    both = scores["precision"] + scores["recall"]
+    scores["f1"] = np.divide(2 * scores["precision"] * scores["recall"], both, out=np.zeros_like(tp), where=both > 0)
+    return scores
+
+
+def write_results(filename, grid, scores):
+    """Write one row per parameter set, best F1 first."""
+    order = np.lexsort((-scores["recall"], -scores["f1"]))
+    columns = ("tp", "fp", "fn", "tn", "precision", "recall", "f1")
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(PARAMETERS + columns)
+        for n in order.tolist():
+            writer.writerow(grid[n].tolist() + [scores[name][n].item() for name in columns])
+    return order
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the drinking thresholds over detection caches.")
+    parser.add_argument("--detection-cache", type=str, default=None, help="Folder of the detection caches to extract features from.")
+    parser.add_argument("--features", type=str, default=None, help="Load features saved with --save-features instead of reading the caches.")
+    parser.add_argument("--save-features", type=str, default=None, help="Save the extracted features to this .npz file.")
+    parser.add_argument("--labels", type=str, required=True, help="CSV of labelled segments: video,start_frame,end_frame,drinking.")
+    for name, default in zip(PARAMETERS, DEFAULTS):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs="+", default=None,
+                            help=f"Values of the {name} threshold (current: {default}).")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for large grids.")
+    parser.add_argument("--output", type=str, default="sweep.csv", help="CSV file with the scores of every parameter set.")
+    parser.add_argument("--top", type=int, default=10, help="Number of best parameter sets printed.")
+    args = parser.parse_args()
+
+    if args.features:
+        saved = np.load(args.features)
+        features, videos = {name: saved[name] for name in FEATURES}, saved["videos"].tolist()
+    elif args.detection_cache:
+        features, videos = load_caches(args.detection_cache)
+    else:
+        parser.error("--detection-cache or --features is required")
+    if args.save_features:
+        np.savez(args.save_features, videos=np.array(videos), **features)
+
+    labels = load_labels(args.labels)
+    labelled = label_rows(features, videos, labels)
+    grid = make_grid({name: getattr(args, name) for name in PARAMETERS})
+    Print.print_info(f"Evaluating {len(grid)} parameter sets on {len(labels)} segments ({len(labelled['frame'])} pig rows)")
+
+    scores = sweep(labelled, grid, args.workers)
+    order = write_results(args.output, grid, scores)
+
+    current = sweep(labelled, np.array([DEFAULTS], dtype=np.float64))
+    print(f"Current thresholds: precision {current['precision'][0]:.3f}  recall {current['recall'][0]:.3f}  f1 {current['f1'][0]:.3f}")
+    print("  ".join(f"{name:>13}" for name in PARAMETERS + ("precision", "recall", "f1")))
+    for n in order[:args.top].tolist():
+        values = grid[n].tolist() + [scores[name][n] for name in ("precision", "recall", "f1")]
+        print("  ".join(f"{value:13.4g}" for value in values))
+    Print.print_info(f"Scores of all parameter sets written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import numpy as np
+from UsefulMath import UMath
+from Detections import Detections
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # Fall back to greedy matching without scipy
+    linear_sum_assignment = None
+
+
+class PigTracker:
+    def __init__(self, movement_threshold=4, standing_threshold=10, iou_threshold=0.1, max_distance=150, max_missed=10):
+        """
+        Assign stable track IDs to pig detections across frames and keep per-track movement state.
+
+        Args:
+            movement_threshold (float): Minimum center displacement (pixels) counted as movement.
+            standing_threshold (float): Maximum change in movement magnitude for a pig to count as standing.
+            iou_threshold (float): Minimum IoU for a detection to continue a track, unless it is within max_distance.
+            max_distance (float): Maximum center distance (pixels) for a detection to continue a track.
+            max_missed (int): Number of frames a track survives without a matching detection.
+        """
+        self.MOVEMENT_THRESHOLD = movement_threshold
+        self.STANDING_THRESHOLD = standing_threshold
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.next_id = 1
+
+        # One row per track, ids stay sorted because new tracks are appended with increasing ids
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.centers = np.empty((0, 2), dtype=np.float32)
+        self.movement = np.empty((0, 2), dtype=np.float32)  # Last movement vector above the threshold
+        self.standing = np.empty(0, dtype=bool)
+        self.missed = np.empty(0, dtype=np.int32)
+        self.flow = np.zeros((0, 2), dtype=np.float32)  # Last optical flow vector, see update_flow()
+
+        self.frame_ids = np.empty(0, dtype=np.int64)  # Track id of each detection of the last update
+        # Change in movement magnitude of each detection of the last update, compared with STANDING_THRESHOLD
+        # (inf for new tracks), so the standing test can be repeated for other thresholds
+        self.frame_change = np.empty(0, dtype=np.float32)
+
+    def _match(self, det_boxes, det_centers):
+        """Associate detections to existing tracks. Returns matched (track rows, detection indices)."""
+        if len(self.ids) == 0 or len(det_boxes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        iou = UMath.iou_matrix(self.boxes, det_boxes)
+        distance = UMath.distances_2d(self.centers[:, None, :], det_centers[None, :, :])
+        valid = (iou >= self.iou_threshold) | (distance <= self.max_distance)
+        cost = (1.0 - iou) + distance / self.max_distance
+        cost[~valid] = 1e6
+
+        if linear_sum_assignment is not None:
+            rows, cols = linear_sum_assignment(cost)
+        else:
+            # Greedy: take the cheapest remaining pair until no valid pairs are left
+            order = np.argsort(cost, axis=None)
+            used_rows, used_cols, rows, cols = set(), set(), [], []
+            for flat in order:
+                r, c = divmod(int(flat), cost.shape[1])
+                if cost[r, c] >= 1e6:
+                    break
+                if r in used_rows or c in used_cols:
+                    continue
+                used_rows.add(r)
+                used_cols.add(c)
+                rows.append(r)
+                cols.append(c)
+            rows, cols = np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+        keep = cost[rows, cols] < 1e6
+        return rows[keep], cols[keep]
+
+    def update(self, detections):
+        """
+        Update the tracks with the pig detections of a new frame.
+
+        Args:
+            detections (Detections or list): Pig detections, or (class name, bounding box, confidence) tuples.
+
+        Returns:
+            ndarray: Track id of each detection, in the order of detections.
+        """
+        if isinstance(detections, Detections):
+            det_boxes = detections.boxes
+        else:
+            det_boxes = np.array([det[1] for det in detections], dtype=np.float32).reshape(-1, 4)
+        det_centers = UMath.get_centers(det_boxes).astype(np.float32)
+
+        rows, cols = self._match(det_boxes, det_centers)
+        det_ids = np.zeros(len(detections), dtype=np.int64)
+        det_change = np.full(len(detections), np.inf, dtype=np.float32)
+
+        # Matched tracks: movement only changes when the center moved more than the threshold
+        if len(rows):
+            delta = det_centers[cols] - self.centers[rows]
+            moved = np.linalg.norm(delta, axis=1) > self.MOVEMENT_THRESHOLD
+            movement = np.where(moved[:, None], delta, self.movement[rows])
+            prev_magnitude = np.linalg.norm(self.movement[rows], axis=1)
+            magnitude = np.linalg.norm(movement, axis=1)
+
+            det_change[cols] = np.abs(prev_magnitude - magnitude)
+            self.standing[rows] = det_change[cols] < self.STANDING_THRESHOLD
+            self.movement[rows] = movement
+            self.boxes[rows] = det_boxes[cols]
+            self.centers[rows] = det_centers[cols]
+            self.missed[rows] = 0
+            det_ids[cols] = self.ids[rows]
+
+        # Unmatched tracks age and are dropped after max_missed frames
+        unmatched = np.ones(len(self.ids), dtype=bool)
+        unmatched[rows] = False
+        self.missed[unmatched] += 1
+        keep = self.missed <= self.max_missed
+        if not keep.all():
+            self.ids, self.boxes, self.centers = self.ids[keep], self.boxes[keep], self.centers[keep]
+            self.movement, self.standing, self.missed = self.movement[keep], self.standing[keep], self.missed[keep]
+            self.flow = self.flow[keep]
+
+        # Unmatched detections start new tracks. Nothing is known about their movement yet,
+        # so they are not standing until they have been seen twice.
+        new = np.ones(len(detections), dtype=bool)
+        new[cols] = False
+        count = int(new.sum())
+        if count:
+            new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+            self.next_id += count
+            det_ids[new] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, det_boxes[new]])
+            self.centers = np.concatenate([self.centers, det_centers[new]])
+            self.movement = np.concatenate([self.movement, np.zeros((count, 2), dtype=np.float32)])
+            self.standing = np.concatenate([self.standing, np.zeros(count, dtype=bool)])
+            self.missed = np.concatenate([self.missed, np.zeros(count, dtype=np.int32)])
+            self.flow = np.concatenate([self.flow, np.zeros((count, 2), dtype=np.float32)])
+
+        self.frame_ids = det_ids
+        self.frame_change = det_change
+        return det_ids
+
+    def update_flow(self, vectors):
+        """
+        Refine the standing state with the optical flow measured inside each pig.
+
+        The box centers only move when the whole pig walks, the flow also picks up a pig that
+        moves on the spot, so a pig only counts as standing if its flow is small as well.
+
+        Args:
+            vectors (dict): Track id -> median flow vector (dx, dy), as returned by PigFlow.update().
+        """
+        if not vectors or not len(self.ids):
+            return
+        track_ids = np.fromiter(vectors.keys(), dtype=np.int64)
+        rows = self.rows(track_ids)
+        known = (rows < len(self.ids)) & (self.ids[np.minimum(rows, len(self.ids) - 1)] == track_ids)
+        rows = rows[known]
+        flow = np.array(list(vectors.values()), dtype=np.float32).reshape(-1, 2)[known]
+
+        self.flow[rows] = flow
+        self.standing[rows] &= np.linalg.norm(flow, axis=1) < self.STANDING_THRESHOLD
+
+    def state(self):
+        """Track state as plain lists, e.g. for a checkpoint."""
+        return {
+            "next_id": self.next_id,
+            "ids": self.ids.tolist(),
+            "boxes": self.boxes.tolist(),
+            "centers": self.centers.tolist(),
+            "movement": self.movement.tolist(),
+            "standing": self.standing.tolist(),
+            "missed": self.missed.tolist(),
+            "flow": self.flow.tolist(),
+        }
+
+    def load_state(self, state):
+        """Restore the track state saved with state()."""
+        self.next_id = state["next_id"]
+        self.ids = np.array(state["ids"], dtype=np.int64)
+        self.boxes = np.array(state["boxes"], dtype=np.float32).reshape(-1, 4)
+        self.centers = np.array(state["centers"], dtype=np.float32).reshape(-1, 2)
+        self.movement = np.array(state["movement"], dtype=np.float32).reshape(-1, 2)
+        self.standing = np.array(state["standing"], dtype=bool)
+        self.missed = np.array(state["missed"], dtype=np.int32)
+        self.flow = np.array(state["flow"], dtype=np.float32).reshape(-1, 2)
+
+    def rows(self, track_ids):
+        """Row index of each track id in the state arrays."""
+        return np.searchsorted(self.ids, track_ids)
+
+    def movement_vector(self, track_id):
+        """Movement vector of one track as a tuple of ints."""
+        dx, dy = self.movement[self.rows([track_id])[0]]
+        return int(dx), int(dy)
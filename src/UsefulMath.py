@@ -1,5 +1,6 @@
 import math
 import yaml
+import numpy as np
 
 class UMath:
     def __init__(self, movement_threshold=4, standing_threshold=10):
@@ -130,20 +131,22 @@ class UMath:
         x_min, y_min, x_max, y_max = map(int, bbox)
         return img[y_min:y_max, x_min:x_max]
 
-    def set_bbox_parameters(self, config_path, bbox_name):
+    def set_bbox_parameters(self, config, bbox_name):
         """
-        Read parameters from a config file and return the bounding box values.
+        Read parameters from the configuration and return the bounding box values.
 
         Args:
-            config_path (str): Path to the configuration YAML file.
+            config (Mapping or str): Configuration loaded with load_config(), or the path to the YAML file.
             bbox_name (str): Name of the bounding box to retrieve (e.g., 'faucet_left').
 
         Returns:
             list: Bounding box [x_min, y_min, x_max, y_max].
         """
+        config_path = config if isinstance(config, str) else None
         try:
-            with open(config_path, 'r') as file:
-                config = yaml.safe_load(file)
+            if config_path is not None:
+                with open(config_path, 'r') as file:
+                    config = yaml.safe_load(file)
             
             if bbox_name not in config:
                 raise ValueError(f"Error: Bounding box '{bbox_name}' not found in config.")
@@ -159,3 +162,64 @@ class UMath:
             raise FileNotFoundError(f"Error: Config file not found at {config_path}.")
         except KeyError as e:
             raise KeyError(f"Error: Missing expected key in the configuration file: {e}")
+
+    # Array versions of the geometry helpers above, for evaluating many boxes at once.
+    # Boxes are (N, 4) arrays of [x_min, y_min, x_max, y_max], points and vectors are (N, 2) arrays.
+
+    @staticmethod
+    def iou_matrix(boxes1, boxes2):
+        """
+        Pairwise IoU between two sets of boxes, the array version of calculate_iou.
+
+        Args:
+            boxes1 (ndarray): (N, 4) boxes.
+            boxes2 (ndarray): (M, 4) boxes.
+
+        Returns:
+            ndarray: (N, M) IoU values, 0 where the union is empty.
+        """
+        boxes1 = np.asarray(boxes1, dtype=np.float32).reshape(-1, 4)
+        boxes2 = np.asarray(boxes2, dtype=np.float32).reshape(-1, 4)
+
+        x1 = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+        y1 = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+        x2 = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+        y2 = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+        area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+        area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+        union = area1[:, None] + area2[None, :] - intersection
+
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    @staticmethod
+    def get_centers(boxes):
+        """Integer centers of (N, 4) boxes as an (N, 2) array, the array version of get_center."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        return ((boxes[:, :2] + boxes[:, 2:]) // 2).astype(np.int32)
+
+    @staticmethod
+    def resize_bboxes(percent, boxes):
+        """
+        Resize (N, 4) boxes by a given percentage, the array version of resize_bbox.
+
+        Returns:
+            ndarray: (N, 4) int32 boxes, truncated like resize_bbox.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        half_delta = (boxes[:, 2:] - boxes[:, :2]) * (percent / 100) / 2
+        return np.concatenate([boxes[:, :2] - half_delta, boxes[:, 2:] + half_delta], axis=1).astype(np.int32)
+
+    @staticmethod
+    def distances_2d(points1, points2):
+        """Euclidean distance between (N, 2) points, or broadcastable shapes."""
+        delta = np.asarray(points2, dtype=np.float32) - np.asarray(points1, dtype=np.float32)
+        return np.hypot(delta[..., 0], delta[..., 1])
+
+    @staticmethod
+    def dot_products(vectors1, vectors2):
+        """Dot product of (N, 2) vectors, or broadcastable shapes such as (N, 1, 2) x (1, M, 2)."""
+        vectors1 = np.asarray(vectors1, dtype=np.float32)
+        vectors2 = np.asarray(vectors2, dtype=np.float32)
+        return vectors1[..., 0] * vectors2[..., 0] + vectors1[..., 1] * vectors2[..., 1]
@@ -4,172 +4,434 @@ from FrameHandler import FrameHandler
 from ComputerVision import Draw
 from UsefulMath import UMath
 from mqtt import MQTT
-import yaml
+from Config import load_config, PredictionLog
+from Motion import MotionGate
+from FaucetROI import FaucetROI
+from OpticalFlow import PigFlow
+from Print import Print
+from Metrics import metrics
+from DetectionCache import DetectionCache, DetectionCacheWriter, cache_folder, cache_settings, find_cache
+import numpy as np
+import copy
+import time
+import os
 import cv2  # Add this import for image processing
 
 class VideoProcessor:
-    def process_video(video_path, args, logger, i):
+    def __init__(self, args, logger, i, first_frame, config, model_names=None):
+        """
+        Hold the per-video state shared between processed frames.
+
+        Args:
+            args: Parsed command line arguments.
+            logger (CSVLogger): Logger for the behaviours found in this video.
+            i (int): Index of the video, used for the output folder name.
+            first_frame (ndarray): First frame of the video, used to size the heatmap.
+            config (Mapping): Read-only configuration loaded once with load_config().
+            model_names (tuple): (detector names, behaviour names) to replay a detection cache without loading the models.
+        """
+        self.args = args
+        self.logger = logger
+        self.umath = UMath()
+
+        # Optional drinking zones: the detector only runs on tiles around the faucets once they are known
+        faucet_roi = None
+        if args.faucet_roi:
+            configured = [self.umath.set_bbox_parameters(config, name) for name in ("faucet_left", "faucet_right") if name in config]
+            faucet_roi = FaucetROI(configured if args.faucet_roi == "config" else None, args.roi_stable_frames, args.roi_tile_size)
+        self.pigMaps = PigMaps(args.device, args.behavior_crop, args.behavior_imgsz, faucet_roi=faucet_roi, model_names=model_names)
+        self.overlay_handler = Overlay(first_frame, args.heatmap_scale, args.heatmap_kernel)
+        self.draw = Draw()
+        self.mqtt = MQTT(config)
+        self.events = {}  # Open behaviour message per pig track id
+        self.additionalSeconds = {}  # Frames each open event is extended by, per pig track id
+        self.out_path = f"/home/aevery/Documents/unfuck/Potential_Drinking{i}"
+
+        self.config = config
+
+        # Drinking predictions of this video are kept in memory and written next to its CSV
+        self.predictions = PredictionLog(f"{os.path.splitext(logger.filename)[0]}_predicted.yaml")
+        self.predictions.start_segment()
+
+        self.flow = PigFlow()  # Optical flow per pig track, caches the previous frame per pig region
+
+        # Optional motion gate: static frames reuse the results of the last inferred frame
+        self.motion_gate = None
+        if args.motion_gate:
+            faucet_boxes = [self.umath.set_bbox_parameters(config, name) for name in ("faucet_left", "faucet_right") if name in config]
+            self.motion_gate = MotionGate(args.motion_threshold, args.motion_faucet_threshold, args.motion_pixel_threshold,
+                                          max_skip=args.motion_max_skip, ramp=args.motion_ramp, faucet_boxes=faucet_boxes)
+        self.last_results = None  # Detection and behaviour results of the last inferred frame
+
+        # Checkpointing, only enabled by process_video when a RunManifest is given
+        self.manifest = None
+        self.video_path = None
+        self.frame_count = 0  # Frames consumed up to the frame being processed
+        self.last_checkpoint = time.monotonic()
+
+        self.cache_writer = None  # Records the model outputs for --from-cache runs, set by process_video
+
+    @staticmethod
+    def process_video(video_path, args, logger, i, config=None, manifest=None):
+        """
+        Process one video file or stream.
+
+        Args:
+            manifest (RunManifest): Optional progress record. The video resumes from its last checkpoint
+                                    and a new checkpoint is saved after every CSV flush.
+
+        Returns:
+            bool: True if the whole video was processed, False if the user stopped it.
+        """
+        if config is None:
+            config = load_config()
+        if args.from_cache:
+            return VideoProcessor.replay_cache(video_path, args, logger, i, config)
         frameHandler = FrameHandler(video_path)
         initialFrame = 0
         frame, _ = frameHandler.get_frame(args.fps, initialFrame)
-        process_interval = int(frameHandler.get_fps() / args.fps)  # Only process every Nth frame
-        pigMaps = PigMaps()
-        overlay_handler = Overlay(frame)
-        draw = Draw()
-        umath = UMath()
+        process_interval = max(1, int(frameHandler.get_fps() / args.fps))  # Only process every Nth frame
         frame_count = initialFrame
-        mqtt = MQTT()
-        additionalSeconds = 0
-        out_path = f"/home/aevery/Documents/unfuck/Potential_Drinking{i}"
-
-        logger_initialized = False  # Flag to track if loggerMessage has been initialized
-        config_file_path = 'src/config.yaml'  # Ensure this is the correct path
-
-        # Load config
-        try:
-            with open(config_file_path, 'r') as file:
-                config = yaml.safe_load(file)
-        except FileNotFoundError:
-            # If the file doesn't exist, initialize with an empty list
-            config = {'confusion': {'predicted': []}}
-        
-        # Ensure 'predicted' is always a list
-        if 'confusion' not in config:
-            config['confusion'] = {}
-        if 'predicted' not in config['confusion']:
-            config['confusion']['predicted'] = []
-        elif not isinstance(config['confusion']['predicted'], list):
-            # If 'predicted' is not a list, convert it to one
-            config['confusion']['predicted'] = [config['confusion']['predicted']]
-        
-        # Append a new segment (0) to y_pred at the start of each video or segment
-        config['confusion']['predicted'].append(0)
-        
-        # Save the updated config back to the file
-        with open(config_file_path, 'w') as file:
-            yaml.dump(config, file)
-
-        prev_frame = None  # Keep track of the previous frame
-
-        while frameHandler.cap.isOpened():
-            frame, frame_count = frameHandler.get_frame(args.fps, frame_count)
-         
-            if frame is None:
-                break
+        processor = VideoProcessor(args, logger, i, frame, config)
+
+        # Streams cannot seek, so only files are checkpointed
+        if manifest is not None and not frameHandler.is_stream:
+            frame_count = processor.enable_checkpoints(manifest, video_path, frameHandler, frame_count)
+
+        # Record the model outputs for --from-cache runs; a resumed video would leave a gap in the cache
+        if args.detection_cache and not frameHandler.is_stream and frame_count == initialFrame:
+            processor.cache_writer = DetectionCacheWriter(cache_folder(args.detection_cache, video_path, args), {
+                "video": os.path.abspath(video_path), "width": frame.shape[1], "height": frame.shape[0],
+                "fps": args.fps, "source_fps": frameHandler.get_fps(), "motion_gate": bool(args.motion_gate),
+                "settings": cache_settings(args)})
+
+        # Live streams are processed frame by frame, files can wait for a full batch
+        batch_size = 1 if args.live else max(1, args.batch_size)
 
-            # Skip frames based on --fps argument
-            if frame_count % process_interval != 0:
-                continue
+        # Decode on a background thread so inference does not wait on the next frame
+        if args.reader_thread:
+            frameHandler.start_reader(process_interval, frame_count, args.queue_size, drop_oldest=args.live)
 
-            # Store current frame as previous frame for next iteration
-            if prev_frame is None:
-                prev_frame = frame.copy()
+        gate = processor.motion_gate
+        interval = process_interval  # Shortened by the motion gate while pigs move near a faucet
+        stop = False
+        while frameHandler.cap.isOpened() and not stop:
+            batch = []
+            while len(batch) < batch_size:
+                # Skip frames based on --fps argument without decoding them
+                with metrics.timer("decode"):
+                    frame, frame_count = frameHandler.next_frame(interval, frame_count)
+                if frame is None:
+                    break
+
+                with metrics.timer("motion"):
+                    infer = gate is None or gate.should_infer(frame)
+                if gate is not None:
+                    interval = gate.interval(process_interval)
+                batch.append((frame, frame_count, infer))
+
+            if not batch:
+                break
+
+            # Run the detector on the frames of the batch that need it, then the behaviour logic frame by frame in order
+            infer_frames = [f for f, _, infer in batch if infer]
+            if batch_size > 1 and infer_frames:
+                detected = iter(processor.pigMaps.get_detections_batch(infer_frames))
+                batch_detections = [next(detected) if infer else None for _, _, infer in batch]
             else:
-                # Assuming pigMaps.detect_behavior returns filtered top detections
-                faucets, feces, pig, movement_vector, behavior2 = pigMaps.detect_behavior(frame)
-                model1, model2, confpig, conffau, behavior =pigMaps.do_drinking_detection(frame,pig,faucets)
-                
-                # Get center coordinates
-                pig_center = umath.get_center(pig[0][1]) if pig else None
-                faucet_centers = [umath.get_center(f[1]) for f in faucets] if faucets else []
-
-                # Safely unpack faucet centers with default values for missing entries
-                faucet_1 = faucet_centers[0] if len(faucet_centers) > 0 else None
-                faucet_2 = faucet_centers[1] if len(faucet_centers) > 1 else None
-                feces_center = umath.get_center(feces[0][1]) if feces else None
-                if movement_vector and faucet_1 and pig_center:
-                    dot1 = umath.calculate_dot_product(
-                        movement_vector, (faucet_1[0] - pig_center[0], faucet_1[1] - pig_center[1])
-                    )
-                else:
-                    dot1 = None
-
-                if movement_vector and faucet_2 and pig_center:
-                    dot2 = umath.calculate_dot_product(
-                        movement_vector, (faucet_2[0] - pig_center[0], faucet_2[1] - pig_center[1])
-                    )
-                else:
-                    dot2 = None
-
-                if behavior:
-                    # Update the last entry in y_pred to 1 if drinking detected
-                    config['confusion']['predicted'][-1] = 1
-                    # Save the updated config to reflect the new value
-                    config_file_path = 'src/config.yaml'  # Use the same path as when loading
-                    with open(config_file_path, 'w') as file:
-                        yaml.dump(config, file)
-                    # frameHandler.save_img_to_folder(out_path,frame, frame_count)
-                    additionalSeconds += 72
-
-                # Initialize logger message only once when behavior starts
-                if behavior and not logger_initialized:
-                    logger.loggerMessage = {
-                        "start_frame": frame_count,  # Set start frame when behavior starts
-                        "end_frame": None,
-                        "behavior": behavior,
-                        "class": [],
-                        "confidence": [],
-                        "coordinates": {
-                            "faucet1": faucet_1,  # Store faucet 1 center
-                            "faucet2": faucet_2,  # Store faucet 2 center
-                            "feces": feces_center,  # Store feces center
-                            "pig": pig_center  # Store pig center
-                        }
-                    }
-                    logger_initialized = True  # Mark loggerMessage as initialized
-
-                    # Extract classes and confidence scores
-                    if pig:
-                        logger.loggerMessage["class"].append("pig")
-                        logger.loggerMessage["confidence"].append(pig[0][2])  # Confidence of the top pig
-
-                    # Append Faucet detections
-                    for i, faucet in enumerate(faucets):
-                        logger.loggerMessage["class"].append(f"faucet{i+1}")  # faucet1, faucet2, etc.
-                        logger.loggerMessage["confidence"].append(faucet[2])  # Confidence of each faucet
-
-                    # Append Feces detection
-                    if feces:
-                        logger.loggerMessage["class"].append("feces")
-                        logger.loggerMessage["confidence"].append(feces[0][2])  # Confidence of the top feces
-
-                # If behavior ends (i.e., pig stops drinking), log the behavior
-                if logger_initialized and not behavior and logger.loggerMessage["start_frame"] is not None and frame_count > logger.loggerMessage["start_frame"] + additionalSeconds:
-                    # Set the end frame when behavior stops and log the behavior
-                    logger.loggerMessage["end_frame"] = frame_count
-                    logger.log_behavior(logger.loggerMessage)
-                    mqtt.publish_drinking(logger.loggerMessage.get("behavior"))
-                    
-                    # Reset logger initialization for the next behavior
-                    logger_initialized = False
-                    logger.loggerMessage["start_frame"] = None
-                    logger.loggerMessage["end_frame"] = None
-                    additionalSeconds = 0
-
-                # Draw the detection boxes on the frame
-                frame = draw.draw_detection_box(frame, faucets)
-                frame = draw.draw_detection_box(frame, feces)
-                frame = draw.draw_detection_box(frame, pig, behavior)
-
-                # Draw Lucas-Kanade vectors
-                if pig:  # Only draw vectors if there's at least one pig detected
-                    frame = draw.draw_lucas_kanade_flow(frame, prev_frame, pig)
-                # Apply overlay (if any)
-                frame = overlay_handler.apply_overlay(pig, frame, args)
-
-                # Show the processed frame
-                frameHandler.showFrame(frame, args.headless)
-
-                # Update prev_frame for next iteration
-                prev_frame = frame.copy()
-
-                # Check for exit key
-                if frameHandler.check_for_key_press():
+                batch_detections = [None] * len(batch)
+
+            for (frame, frame_count, infer), detections in zip(batch, batch_detections):
+                stop = processor.process_frame(frame, frame_count, frameHandler, detections, reuse=not infer)
+                metrics.frame_done(frameHandler.dropped_frames)
+                processor.checkpoint_if_due()
+                if stop:
                     break
 
-            # Update frame for next iteration
-            prev_frame = frame.copy()
-        
         # Release the frame handler after processing
         frameHandler.release()
+        processor.finish()
+        # Only whole videos are cached, a replay must see every frame
+        if processor.cache_writer is not None and not stop:
+            processor.cache_writer.close()
+            Print.print_info(f"Detection cache written to {processor.cache_writer.folder}")
+        if metrics.enabled:
+            metrics.report()
         # overlay_handler.plot_3d_heatmap()
+        return not stop
+
+    @staticmethod
+    def replay_cache(video_path, args, logger, i, config):
+        """
+        Run the behaviour logic on the model outputs recorded in the detection cache of a video, without
+        decoding a frame or running a model. Only the analytics output is produced, there is nothing to draw on.
+
+        Returns:
+            bool: True if the cache was replayed.
+        """
+        folder = find_cache(args.detection_cache, video_path, args)
+        if folder is None:
+            Print.print_error(f"No detection cache for {video_path} with these models in {args.detection_cache}, "
+                              f"process it once with --detection-cache first")
+            return False
+        cache = DetectionCache(folder)
+
+        # The recorded frames already reflect the motion gate of the recording run
+        args = copy.copy(args)
+        args.analytics_only = True
+        args.motion_gate = False
+        blank = np.zeros((cache.meta["height"], cache.meta["width"], 3), dtype=np.uint8)  # Only sizes the heatmap
+        processor = VideoProcessor(args, logger, i, blank, config, (cache.detector_names, cache.behavior_names))
+
+        Print.print_info(f"Replaying {len(cache)} frames of {os.path.basename(video_path)} from {folder}")
+        for frame_count, cached in cache:
+            processor.process_frame(None, frame_count, None, reuse=cached is None, cached=cached)
+            metrics.frame_done(0)
+        processor.finish()
+        if metrics.enabled:
+            metrics.report()
+        return True
+
+    def enable_checkpoints(self, manifest, video_path, frameHandler, frame_count):
+        """
+        Restore the state of the last checkpoint of this video, if any, and save a checkpoint after every
+        CSV flush from now on, so the rows on disk always match the saved state.
+
+        Returns:
+            int: Frame count to continue from.
+        """
+        self.manifest = manifest
+        self.video_path = video_path
+        entry = manifest.load(video_path)
+
+        # The first frame is already read, so the capture is one frame ahead of frame_count
+        if entry is not None and entry.get("status") == "running" and frameHandler.seek(entry["last_frame"] + 1):
+            self.restore(entry)
+            frame_count = entry["last_frame"]
+            Print.print_info(f"Resuming {os.path.basename(video_path)} from frame {frame_count}")
+
+        self.frame_count = frame_count
+        self.logger.on_flush = self.save_checkpoint
+        return frame_count
+
+    def restore(self, entry):
+        """Restore the open events, track state and predictions saved by save_checkpoint()."""
+        # Rows written after the checkpoint would be logged twice, cut them off
+        self.logger.truncate_outputs(entry["offsets"])
+        self.events = {int(track_id): message for track_id, message in entry["events"].items()}
+        self.additionalSeconds = {int(track_id): frames for track_id, frames in entry["additionalSeconds"].items()}
+        self.pigMaps.tracker.load_state(entry["tracker"])
+        self.umath.prev_movement_vector = {int(k): tuple(v) for k, v in entry["umath"]["prev_movement_vector"].items()}
+        self.umath.pig_prev_centers = {int(k): tuple(v) for k, v in entry["umath"]["pig_prev_centers"].items()}
+        self.predictions.predicted = entry["predictions"]
+
+    def save_checkpoint(self):
+        """Save the state after the frame being processed, with the CSV sizes it corresponds to."""
+        if self.manifest is None:
+            return
+        self.manifest.save(self.video_path, {
+            "status": "running",
+            "last_frame": self.frame_count,
+            "events": self.events,
+            "additionalSeconds": self.additionalSeconds,
+            "tracker": self.pigMaps.tracker.state(),
+            "umath": {"prev_movement_vector": self.umath.prev_movement_vector,
+                      "pig_prev_centers": self.umath.pig_prev_centers},
+            "predictions": self.predictions.predicted,
+            "offsets": self.logger.output_offsets(),
+        })
+        self.last_checkpoint = time.monotonic()
+
+    def checkpoint_if_due(self):
+        """Save a checkpoint when --checkpoint-interval seconds have passed since the last one."""
+        if self.manifest is not None and time.monotonic() - self.last_checkpoint >= self.args.checkpoint_interval:
+            # Buffered rows belong to events that are no longer in the saved state, write them first
+            self.logger.flush()
+            self.save_checkpoint()
+
+    def finish(self):
+        """Write the per-video outputs that are only complete once the video has ended."""
+        self.predictions.end_segment()
+        if self.args.analytics_only and self.args.heatmap:
+            # Nothing was rendered, keep the accumulated heatmap instead
+            self.overlay_handler.save_heatmap(f"{os.path.splitext(self.logger.filename)[0]}_heatmap.npy")
+        gate = self.motion_gate
+        if gate is not None:
+            Print.print_info(f"Motion gate skipped inference on {gate.skipped} of {gate.frames} frames ({gate.skip_ratio():.0%})")
+
+    def process_frame(self, frame, frame_count, frameHandler, detections=None, reuse=False, cached=None):
+        """
+        Run behaviour detection, logging and drawing for one sampled frame.
+
+        Args:
+            frame (ndarray): Frame to process.
+            frame_count (int): Index of the frame in the video.
+            frameHandler (FrameHandler): Handler used to display the frame and read key presses.
+            detections (list): Detector output for this frame if it was already computed in a batch.
+            reuse (bool): The scene has not changed, reuse the results of the last inferred frame.
+            cached (CachedFrame): Model outputs replayed from a detection cache; frame is None then.
+
+        Returns:
+            bool: True if the user asked to stop processing.
+        """
+        args = self.args
+        logger = self.logger
+        umath = self.umath
+        draw = self.draw
+        self.frame_count = frame_count
+
+        if reuse and self.last_results is not None:
+            # Static scene: keep the detections, tracks and behaviours of the last inferred frame
+            faucets, feces, pig, movement_vector, behavior2, model1, model2, confpig, conffau, behavior = self.last_results
+            if self.cache_writer is not None:
+                self.cache_writer.add(frame_count, reuse=True)
+        else:
+            if cached is not None:
+                detections = cached.detections
+                self.pigMaps.cached_behavior = cached.behavior
+            elif self.cache_writer is not None and detections is None:
+                # The raw detector output is recorded, so it is computed here instead of in detect_behavior
+                detections = self.pigMaps.get_detections(frame)
+
+            # Assuming pigMaps.detect_behavior returns filtered top detections
+            faucets, feces, pig, movement_vector, behavior2 = self.pigMaps.detect_behavior(frame, detections)
+            # Flow inside each pig refines the standing state before the drinking check
+            with metrics.timer("geometry"):
+                vectors = cached.flow_vectors(self.pigMaps.tracks) if cached is not None else self.flow.update(frame, self.pigMaps.tracks)
+                self.pigMaps.tracker.update_flow(vectors)
+            model1, model2, confpig, conffau, behavior =self.pigMaps.do_drinking_detection(frame,pig,faucets)
+            if self.cache_writer is not None:
+                self.record_frame(frame_count, frame, detections, vectors, pig, faucets)
+            self.last_results = (faucets, feces, pig, movement_vector, behavior2, model1, model2, confpig, conffau, behavior)
+            if self.motion_gate is not None:
+                self.motion_gate.set_faucet_boxes(faucets.boxes)
+
+        # Get center coordinates
+        pig_center = umath.get_center(pig[0][1]) if pig else None
+        faucet_centers = [umath.get_center(f[1]) for f in faucets] if faucets else []
+
+        # Safely unpack faucet centers with default values for missing entries
+        faucet_1 = faucet_centers[0] if len(faucet_centers) > 0 else None
+        faucet_2 = faucet_centers[1] if len(faucet_centers) > 1 else None
+        feces_center = umath.get_center(feces[0][1]) if feces else None
+        if movement_vector and faucet_1 and pig_center:
+            dot1 = umath.calculate_dot_product(
+                movement_vector, (faucet_1[0] - pig_center[0], faucet_1[1] - pig_center[1])
+            )
+        else:
+            dot1 = None
+
+        if movement_vector and faucet_2 and pig_center:
+            dot2 = umath.calculate_dot_product(
+                movement_vector, (faucet_2[0] - pig_center[0], faucet_2[1] - pig_center[1])
+            )
+        else:
+            dot2 = None
+
+        if behavior == "Drinking":
+            self.predictions.mark_drinking()
+            # frameHandler.save_img_to_folder(self.out_path,frame, frame_count)
+
+        # Every tracked pig has its own drinking event. Tracks that disappeared can still end an open event.
+        pigs_by_track = dict(self.pigMaps.tracks)
+        for track_id in sorted(set(pigs_by_track) | set(self.events)):
+            if self.pigMaps.track_behaviors.get(track_id) == "Drinking":
+                self.additionalSeconds[track_id] = self.additionalSeconds.get(track_id, 0) + 72
+
+                # Initialize the event message only once when behavior starts
+                if track_id not in self.events:
+                    self.events[track_id] = self.start_event(track_id, pigs_by_track[track_id], faucets, feces, frame_count)
+
+            # If behavior ends (i.e., pig stops drinking), log the behavior
+            elif track_id in self.events and frame_count > self.events[track_id]["start_frame"] + self.additionalSeconds.get(track_id, 0):
+                self.end_event(track_id, frame_count)
+
+        # Write out buffered rows once every track of the frame is handled, so a checkpoint saved by the
+        # flush never sees a frame half done
+        with metrics.timer("csv"):
+            logger.flush_if_due()
+
+        if args.analytics_only:
+            # Nothing is shown: skip all drawing and GUI polling, only keep the heatmap statistics
+            if args.heatmap:
+                with metrics.timer("overlay"):
+                    self.overlay_handler.updateHeatmap(pig)
+            return False
+
+        with metrics.timer("drawing"):
+            # Draw the detection boxes on the frame
+            frame = draw.draw_detection_box(frame, faucets)
+            frame = draw.draw_detection_box(frame, feces)
+            for track_id, pig_detection in self.pigMaps.tracks:
+                frame = draw.draw_detection_box(frame, [pig_detection], self.pigMaps.track_behaviors.get(track_id))
+
+            # Draw Lucas-Kanade vectors
+            if pig:  # Only draw vectors if there's at least one pig detected
+                frame = draw.draw_lucas_kanade_flow(frame, self.flow.pairs, self.pigMaps.tracks)
+
+        # Apply overlay (if any)
+        with metrics.timer("overlay"):
+            frame = self.overlay_handler.apply_overlay(pig, frame, args)
+
+        with metrics.timer("display"):
+            # Show the processed frame
+            frameHandler.showFrame(frame, args.headless)
+
+            # Check for exit key
+            return frameHandler.check_for_key_press()
+
+    def record_frame(self, frame_count, frame, detections, vectors, pigs, faucets):
+        """
+        Add the model outputs of an inferred frame to the detection cache. The behaviour model is run for
+        every pig next to a faucet, not only the ones that passed model 1, so any thresholds can be replayed.
+        """
+        flow = [vectors.get(track_id, (np.nan, np.nan)) for track_id, _ in self.pigMaps.tracks]
+        behavior = self.pigMaps.behavior_detections_all(frame, pigs, faucets)
+        self.cache_writer.add(frame_count, detections, flow, behavior)
+
+    def start_event(self, track_id, pig, faucets, feces, frame_count):
+        """Build the logger message for a behaviour that starts on this frame for one pig track."""
+        umath = self.umath
+        faucet_centers = [umath.get_center(f[1]) for f in faucets]
+        message = {
+            "start_frame": frame_count,  # Set start frame when behavior starts
+            "end_frame": None,
+            "behavior": self.pigMaps.track_behaviors.get(track_id),
+            "pig_id": track_id,
+            "class": [],
+            "confidence": [],
+            "coordinates": {
+                "faucet1": faucet_centers[0] if len(faucet_centers) > 0 else None,  # Store faucet 1 center
+                "faucet2": faucet_centers[1] if len(faucet_centers) > 1 else None,  # Store faucet 2 center
+                "feces": umath.get_center(feces[0][1]) if feces else None,  # Store feces center
+                "pig": umath.get_center(pig[1])  # Store pig center
+            }
+        }
+
+        # Extract classes and confidence scores
+        message["class"].append("pig")
+        message["confidence"].append(pig[2])  # Confidence of this pig
+
+        # Append Faucet detections
+        for n, faucet in enumerate(faucets):
+            message["class"].append(f"faucet{n+1}")  # faucet1, faucet2, etc.
+            message["confidence"].append(faucet[2])  # Confidence of each faucet
+
+        # Append Feces detection
+        if feces:
+            message["class"].append("feces")
+            message["confidence"].append(feces[0][2])  # Confidence of the top feces
+        return message
+
+    def end_event(self, track_id, frame_count):
+        """Log and publish the open behaviour of one pig track and reset it for the next behaviour."""
+        message = self.events.pop(track_id)
+        self.additionalSeconds.pop(track_id, None)
+
+        # Set the end frame when behavior stops and log the behavior
+        message["end_frame"] = frame_count
+        self.logger.loggerMessage = message
+        with metrics.timer("csv"):
+            self.logger.log_behavior(message)
+        with metrics.timer("mqtt"):
+            self.mqtt.publish_drinking(message.get("behavior"))
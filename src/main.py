@@ -1,13 +1,36 @@
-
 from pigParser import Parser
 from mediaHandler import MediaHandler
+from ModelHandler import ModelHandler
+from CSV import CSVLogger
+from Print import Print
+from Metrics import metrics
+
+
+def main():
+    # Parse the command line arguments
+    args = Parser().parse_args()
+
+    # Levelled console output and optional pipeline timings
+    Print.configure(args.log_level)
+    metrics.configure(args.metrics, args.metrics_interval, args.metrics_file)
+
+    # Flush buffered CSV rows if the process is terminated
+    CSVLogger.install_signal_handlers()
+
+    # Load and warm up the models once so the first frame of the first video is not slow.
+    # With several workers each worker process loads its own copy instead.
+    # Replaying a detection cache does not use the models at all.
+    if args.workers <= 1 and not args.from_cache:
+        ModelHandler.preload(device=args.device)
+
+    # Extract the video path and other arguments
+    input_path = args.video_source
 
-# Parse the command line arguments
-args = Parser().parse_args()
+    # Handle video input (either folder or single video)
+    media = MediaHandler()
+    media.handle_video_input(input_path, args)
 
-# Extract the video path and other arguments
-input_path = args.video_source
 
-# Handle video input (either folder or single video)
-media = MediaHandler()
-media.handle_video_input(input_path, args)
+# Spawned worker processes import this module as __mp_main__ and must not run the startup again
+if __name__ == "__main__":
+    main()
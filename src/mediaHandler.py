@@ -1,33 +1,134 @@
 import os
+import re
+import contextlib
+import datetime
+import cv2
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from urllib.parse import urlparse
-from CSV import CSVLogger
+from CSV import CSVLogger, FullDayWriter
+from Parquet import ParquetLogger
 from VideoProcessor import VideoProcessor
+from ModelHandler import ModelHandler
 from Overlay import Overlay
+from Config import load_config
+from MultiCamera import Camera, InferenceScheduler, load_cameras
+from Checkpoint import RunManifest
+from Print import Print
+from Metrics import metrics
+
+# Configuration of a worker process, loaded once by _init_worker
+_worker_config = None
+
+
+def _init_worker(args):
+    """Load the models and the configuration once in each worker process before it takes its first video."""
+    global _worker_config
+    Print.configure(args.log_level)
+    # Every worker writes its own metrics file, named after its process id
+    metrics_file = None
+    if args.metrics_file:
+        root, ext = os.path.splitext(args.metrics_file)
+        metrics_file = f"{root}.{os.getpid()}{ext}"
+    metrics.configure(args.metrics, args.metrics_interval, metrics_file)
+    _worker_config = load_config()
+    if not args.from_cache:
+        ModelHandler.preload(device=args.device)
+
+
+def _process_video_worker(video_full_path, output_folder, csv_filename, args, i, fullday_queue):
+    """Process one video in a worker process. Full-day rows are sent to the parent through fullday_queue."""
+    manifest = RunManifest(output_folder) if args.checkpoint and not args.from_cache else None
+    with CSVLogger(output_folder, csv_filename, log_full_day=True, fullday_queue=fullday_queue,
+                   **MediaHandler.csv_options(args)) as logger:
+        MediaHandler.attach_sinks(logger, args, video_full_path, output_folder)
+        completed = VideoProcessor.process_video(video_full_path, args, logger, i, _worker_config, manifest)
+    if completed and manifest is not None:
+        manifest.mark_done(video_full_path)
+    return video_full_path
+
 
 class MediaHandler:
+    def __init__(self, config=None):
+        # Read-only configuration, loaded once and passed to every video
+        self.config = config if config is not None else load_config()
+
+    @staticmethod
+    def csv_options(args):
+        """Buffered writer settings for CSVLogger taken from the command line arguments."""
+        return {
+            "flush_rows": args.csv_flush_rows,
+            "flush_interval": args.csv_flush_interval,
+            "fsync": args.csv_fsync,
+        }
 
-    def create_output_folder(self, input_path, output_base):
-        """Create the output folder based on the input path."""
+    # Start time in a camera file name, e.g. pen1_20240220_081500.mp4 or 2024-02-20T08-15-00.mp4
+    FILENAME_TIME = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})[_T -]?(\d{2})[-:]?(\d{2})[-:]?(\d{2})")
+
+    @staticmethod
+    def recording_start(input_path):
+        """
+        Wall clock time of the first frame. Streams start now. Files use the time in their name if
+        there is one, otherwise their modification time minus the clip length, because the
+        modification time of a finished recording is when it ended.
+        """
+        if urlparse(input_path).scheme:
+            return datetime.datetime.now()
+
+        match = MediaHandler.FILENAME_TIME.search(os.path.basename(input_path))
+        if match:
+            try:
+                return datetime.datetime(*map(int, match.groups()))
+            except ValueError:
+                pass  # Digits that only look like a date
+
+        end = datetime.datetime.fromtimestamp(os.path.getmtime(input_path))
+        cap = cv2.VideoCapture(input_path)
+        frames, fps = cap.get(cv2.CAP_PROP_FRAME_COUNT), cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        if frames > 0 and fps > 0:
+            return end - datetime.timedelta(seconds=frames / fps)
+        return end
+
+    @staticmethod
+    def attach_sinks(logger, args, input_path, output_folder):
+        """Attach the optional outputs that receive the same behaviour events as the CSV files."""
+        # Time bins of the aggregate store are relative to the start of the recording
+        logger.start_time = MediaHandler.recording_start(input_path)
+        if args.parquet:
+            # The pen is the name the output folder was created from, the day is the recording day of the file
+            pen = os.path.basename(output_folder)[:-len("-Data")]
+            day = logger.start_time.date()
+            logger.add_sink(ParquetLogger(args.parquet, pen, os.path.basename(input_path) or pen, day))
+
+    def create_output_folder(self, input_path, output_base, folder_name=None):
+        """Create the output folder based on the input path, or on folder_name if given."""
         # Use URL's netloc or file's basename for folder naming
         parsed_url = urlparse(input_path)
-        if parsed_url.scheme:
-            folder_name = parsed_url.netloc or "stream"
-        else:
-            # If it's a file path, use the parent directory name
-            parent_dir = os.path.basename(os.path.dirname(input_path))
-            folder_name = parent_dir if parent_dir else os.path.basename(input_path)
+        if folder_name is None:
+            if parsed_url.scheme:
+                folder_name = parsed_url.netloc or "stream"
+            else:
+                # If it's a file path, use the parent directory name
+                parent_dir = os.path.basename(os.path.dirname(input_path))
+                folder_name = parent_dir if parent_dir else os.path.basename(input_path)
         
         # Append -Data to the folder name
         output_folder = os.path.join(output_base, f"{folder_name}-Data")
         os.makedirs(output_folder, exist_ok=True)
-        print(f"Output folder created at: {output_folder}")
+        Print.print_info(f"Output folder created at: {output_folder}")
         return output_folder
 
     def process_video_files_in_directory(self, input_path, output_base, args, log_full_day=True):
         """Process all video files in a given directory."""
         video_files = [f for f in os.listdir(input_path)
                        if os.path.isfile(os.path.join(input_path, f)) and f.lower().endswith(('.mp4', '.avi', '.mov'))]
-        
+
+        if args.workers > 1:
+            self.process_video_files_in_parallel(input_path, video_files, output_base, args, log_full_day)
+            return
+
         for i, video_file in enumerate(video_files):
             # Use the video file name (without extension) as the CSV filename
             csv_filename = f"{os.path.splitext(video_file)[0]}.csv"
@@ -35,11 +136,60 @@ class MediaHandler:
             # Create the output folder for each video based on the directory name
             video_full_path = os.path.join(input_path, video_file)
             output_folder = self.create_output_folder(video_full_path, output_base)
-            
-            logger = CSVLogger(output_folder, csv_filename, log_full_day)
-            
+
+            # A replay from the detection cache must not mark the video as processed for real runs
+            manifest = RunManifest(output_folder) if args.checkpoint and not args.from_cache else None
+            if manifest is not None and manifest.is_done(video_full_path):
+                Print.print_info(f"Skipping {video_file}, already processed")
+                continue
+
             # Initialize CSV logger for this video, with the log_full_day flag
-            VideoProcessor.process_video(video_full_path, args, logger, i+300)
+            with CSVLogger(output_folder, csv_filename, log_full_day, **self.csv_options(args)) as logger:
+                self.attach_sinks(logger, args, video_full_path, output_folder)
+                completed = VideoProcessor.process_video(video_full_path, args, logger, i+300, self.config, manifest)
+            if completed and manifest is not None:
+                manifest.mark_done(video_full_path)
+
+    def process_video_files_in_parallel(self, input_path, video_files, output_base, args, log_full_day=True):
+        """Spread the video files over a pool of worker processes, each holding its own models."""
+        # Spawn instead of fork so workers do not inherit OpenCV/torch threads from the parent
+        context = multiprocessing.get_context("spawn")
+        manager = context.Manager()
+        fullday_queue = manager.Queue() if log_full_day else None
+
+        # One thread in this process owns fullday.csv and appends the rows sent by the workers
+        writer_thread = None
+        if fullday_queue is not None:
+            writer_thread = threading.Thread(target=FullDayWriter(fullday_queue, args.csv_fsync).run, daemon=True)
+            writer_thread.start()
+
+        Print.print_info(f"Processing {len(video_files)} videos with {args.workers} workers...")
+        try:
+            with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(args,)) as executor:
+                futures = {}
+                for i, video_file in enumerate(video_files):
+                    csv_filename = f"{os.path.splitext(video_file)[0]}.csv"
+                    video_full_path = os.path.join(input_path, video_file)
+                    output_folder = self.create_output_folder(video_full_path, output_base)
+                    if args.checkpoint and not args.from_cache and RunManifest(output_folder).is_done(video_full_path):
+                        Print.print_info(f"Skipping {video_file}, already processed")
+                        continue
+                    future = executor.submit(_process_video_worker, video_full_path, output_folder,
+                                             csv_filename, args, i+300, fullday_queue)
+                    futures[future] = video_file
+
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        Print.print_info(f"Finished processing {futures[future]}")
+                    except Exception as e:
+                        Print.print_error(f"Error processing {futures[future]}: {e}")
+        finally:
+            if writer_thread is not None:
+                fullday_queue.put(None)
+                writer_thread.join()
+            manager.shutdown()
 
     def process_single_video(self, input_path, output_base, args):
         """Process a single video file or URL and create the output folder."""
@@ -54,27 +204,65 @@ class MediaHandler:
         output_folder = self.create_output_folder(input_path, output_base)
         
         csv_filename = f"{file_name}.csv"
-        logger = CSVLogger(output_folder, csv_filename, args.live)
-        VideoProcessor.process_video(input_path, args, logger, i=0 if not args.live else 300)
+        manifest = RunManifest(output_folder) if args.checkpoint and not args.from_cache and not parsed_url.scheme else None
+        if manifest is not None and manifest.is_done(input_path):
+            Print.print_info(f"Skipping {input_path}, already processed")
+            return
+        with CSVLogger(output_folder, csv_filename, args.live, **self.csv_options(args)) as logger:
+            self.attach_sinks(logger, args, input_path, output_folder)
+            completed = VideoProcessor.process_video(input_path, args, logger, i=0 if not args.live else 300,
+                                                     config=self.config, manifest=manifest)
+        if completed and manifest is not None:
+            manifest.mark_done(input_path)
+
+    def process_cameras(self, cameras_file, output_base, args):
+        """
+        Process several cameras in this process with one shared set of models.
+
+        Every camera has its own reader thread, PigMaps, events and CSV files in <name>-Data;
+        the InferenceScheduler batches their frames into shared detector calls.
+        """
+        with contextlib.ExitStack() as stack:
+            cameras = []
+            for i, (name, source) in enumerate(load_cameras(cameras_file)):
+                output_folder = self.create_output_folder(source, output_base, folder_name=name)
+                logger = stack.enter_context(CSVLogger(output_folder, f"{name}.csv", True, **self.csv_options(args)))
+                self.attach_sinks(logger, args, source, output_folder)
+                try:
+                    camera = Camera(name, source, args, logger, 300 + i, self.config)
+                except ValueError as e:
+                    Print.print_error(f"Skipping camera {name}: {e}")
+                    continue
+                # Stop the reader and finish the outputs before the logger is closed
+                stack.callback(camera.close)
+                cameras.append(camera)
+
+            if cameras:
+                InferenceScheduler(cameras, args.batch_size, args.camera_batch_wait, args.camera_frames_per_batch).run()
+            if metrics.enabled:
+                metrics.report()
 
     def handle_video_input(self, input_path, args):
         """Main function to handle input path (file, directory, or URL) and initiate video processing."""
-        print(f"Handling input path: {input_path}")
+        Print.print_info(f"Handling input path: {input_path}")
         
         # No need to normalize URL paths with os.path.normpath
         output_base = os.getcwd()  # Get the current working directory 
 
         parsed_url = urlparse(input_path)
-        if parsed_url.scheme:  # If it's a URL
-            print("Processing video stream...")
+        if args.cameras:
+            Print.print_info("Processing camera list...")
+            self.process_cameras(input_path, output_base, args)
+        elif parsed_url.scheme:  # If it's a URL
+            Print.print_info("Processing video stream...")
             self.process_single_video(input_path, output_base, args)
         elif os.path.isdir(input_path):
-            print("Processing directory...")
+            Print.print_info("Processing directory...")
             # Here, we use input_path directly as the directory to process, 
             # but we pass output_base to create_output_folder to get the right naming for each video
             self.process_video_files_in_directory(input_path, output_base, args)
         elif os.path.isfile(input_path):
-            print("Processing single video file...")
+            Print.print_info("Processing single video file...")
             self.process_single_video(input_path, output_base, args)
         else:
-            print(f"Error: {input_path} is not a valid file, folder, or URL.")
\ No newline at end of file
+            Print.print_error(f"{input_path} is not a valid file, folder, or URL.")
\ No newline at end of file
@@ -1,22 +1,265 @@
 import paho.mqtt.client as mqtt
-import yaml
+import atexit
+import collections
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from Config import load_config
+from Print import Print
+
+
+class MQTTPublisher:
+    """
+    One persistent broker connection per process. Events are queued in a bounded buffer and
+    published from a background thread, so processing never waits on the network. When the
+    event rate is high they are sent as one aggregate message per interval, and while the
+    broker is unreachable they are spilled to a local file and re-sent after reconnecting.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls, config):
+        """Return the publisher of this process, connecting on first use."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(config)
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    def __init__(self, config, queue_size=1000, batch_interval=5.0, batch_threshold=20, spool_file="mqtt_spool.jsonl"):
+        """
+        Args:
+            config (Mapping): Configuration with the 'mqtt' section (host, port, user, password, optional qos).
+            queue_size (int): Maximum number of events waiting in memory; more are spilled to disk.
+            batch_interval (float): Length in seconds of the window used for rate measuring and aggregation.
+            batch_threshold (int): More events than this per window are sent as one aggregate message.
+            spool_file (str): File events are spilled to while the broker is unreachable. Every process
+                              spills to its own copy named after its process id (mqtt_spool.<pid>.jsonl),
+                              so worker processes never rewrite each other's events.
+        """
+        settings = config["mqtt"]
+        self.qos = settings.get("qos", 1)
+        self.batch_interval = settings.get("batch_interval", batch_interval)
+        self.batch_threshold = settings.get("batch_threshold", batch_threshold)
+        self.spool_base = settings.get("spool_file", spool_file)
+        root, ext = os.path.splitext(self.spool_base)
+        self.spool_file = f"{root}.{os.getpid()}{ext}"
+
+        self.events = queue.Queue(maxsize=queue_size)
+        self.sent_times = collections.deque()  # Publish times within the last batch_interval
+        self.in_flight = collections.deque()  # (message info, topic, payload) of QoS>0 messages not yet acknowledged
+        self.spool_lock = threading.Lock()
+        # Events spilled by processes that have exited are re-sent by this one
+        self._adopt_orphan_spools()
+        self.connected = threading.Event()
+        self.stop_event = threading.Event()
 
-class MQTT:
-    def __init__(self):
-        with open("src/config.yaml", "r") as file:
-            self.config = yaml.safe_load(file)
-        host = self.config["mqtt"]["host"]
-        port = self.config["mqtt"]["port"]
-        user = self.config["mqtt"]["user"]
-        password = self.config["mqtt"]["password"]
-        
         self.remote_client = mqtt.Client()
-        self.remote_client.username_pw_set(user, password)
-        self.remote_client.connect(host, port)
+        self.remote_client.username_pw_set(settings["user"], settings["password"])
+        self.remote_client.on_connect = self.on_connect
+        self.remote_client.on_disconnect = self.on_disconnect
+        self.remote_client.reconnect_delay_set(min_delay=1, max_delay=60)
+        # Connect in the network thread so an unreachable broker does not block or fail processing
+        self.remote_client.connect_async(settings["host"], settings["port"])
         self.remote_client.loop_start()
 
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
     def on_connect(self, client, userdata, flags, rc):
-        print("Connected with result code "+str(rc))
+        Print.print_info("Connected with result code "+str(rc))
+        if rc == 0:
+            self.connected.set()
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+
+    def publish(self, topic, payload):
+        """Queue an event without blocking. If the buffer is full the event goes to the spool file."""
+        try:
+            self.events.put_nowait((topic, payload))
+        except queue.Full:
+            self._spill([(topic, payload)])
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                first = self.events.get(timeout=0.5)
+            except queue.Empty:
+                if self.connected.is_set():
+                    self._resend_spool()
+                continue
+
+            batch = [first] + self._drain()
+            now = time.monotonic()
+            while self.sent_times and now - self.sent_times[0] > self.batch_interval:
+                self.sent_times.popleft()
+
+            if len(batch) + len(self.sent_times) > self.batch_threshold:
+                # High event rate: collect the rest of the window and send one aggregate message
+                deadline = now + self.batch_interval
+                while not self.stop_event.is_set() and time.monotonic() < deadline:
+                    try:
+                        batch.append(self.events.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                self._send(batch, aggregate=True)
+            else:
+                self._send(batch)
+
+        # Send (or spill) whatever is left when shutting down
+        self._send(self._drain())
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                items.append(self.events.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _send(self, batch, aggregate=False):
+        if not batch:
+            return
+        if not self.connected.is_set():
+            self._spill(batch)
+            return
+        self._resend_spool()
+
+        if aggregate:
+            by_topic = collections.OrderedDict()
+            for topic, payload in batch:
+                by_topic.setdefault(topic, []).append(self._as_text(payload))
+            messages = [(f"{topic}/batch", json.dumps({"count": len(payloads), "events": payloads}))
+                        for topic, payloads in by_topic.items()]
+        else:
+            messages = batch
+
+        for n, (topic, payload) in enumerate(messages):
+            info = self.remote_client.publish(topic, payload, qos=self.qos)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                # Connection dropped mid-batch, keep the unsent events for later
+                self._spill(batch if aggregate else messages[n:])
+                return
+            self._track(info, topic, payload)
+        self.sent_times.extend([time.monotonic()] * len(batch))
+
+    def _track(self, info, topic, payload):
+        """Remember a QoS>0 message until the broker acknowledges it, see close()."""
+        if self.qos == 0:
+            return
+        while self.in_flight and self.in_flight[0][0].is_published():
+            self.in_flight.popleft()
+        self.in_flight.append((info, topic, payload))
+
+    @staticmethod
+    def _as_text(payload):
+        return payload.decode() if isinstance(payload, bytes) else payload
+
+    def _spill(self, items):
+        """Append events to the spool file so they survive a broker outage."""
+        with self.spool_lock:
+            try:
+                with open(self.spool_file, 'a') as file:
+                    for topic, payload in items:
+                        file.write(json.dumps({"topic": topic, "payload": self._as_text(payload)}) + "\n")
+            except Exception as e:
+                Print.print_error(f"Error spilling MQTT events: {e}")
+
+    @staticmethod
+    def _process_exists(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _adopt_orphan_spools(self):
+        """
+        Move the events of spool files left by exited processes (and of the shared spool file of
+        older versions) into the spool file of this process.
+        """
+        root, ext = os.path.splitext(self.spool_base)
+        for path in [self.spool_base] + sorted(glob.glob(f"{glob.escape(root)}.*{ext}")):
+            pid = path[len(root) + 1:len(path) - len(ext)] if path != self.spool_base else None
+            if pid is not None and (not pid.isdigit() or int(pid) == os.getpid() or self._process_exists(int(pid))):
+                continue
+            # Renaming is atomic, so only one starting process adopts each file
+            claimed = f"{self.spool_file}.adopting"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            with self.spool_lock, open(claimed, 'r') as source, open(self.spool_file, 'a') as target:
+                target.writelines(line for line in source if line.strip())
+            os.remove(claimed)
+            Print.print_info(f"Re-sending MQTT events spilled to {path}")
+
+    def _resend_spool(self):
+        """Publish the spilled events, keeping the ones that could not be sent."""
+        with self.spool_lock:
+            if not os.path.exists(self.spool_file):
+                return
+            with open(self.spool_file, 'r') as file:
+                items = [json.loads(line) for line in file if line.strip()]
+
+            remaining = []
+            for item in items:
+                if remaining:
+                    remaining.append(item)
+                    continue
+                info = self.remote_client.publish(item["topic"], item["payload"], qos=self.qos)
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    remaining.append(item)
+                else:
+                    self._track(info, item["topic"], item["payload"])
+
+            if remaining:
+                with open(self.spool_file, 'w') as file:
+                    file.writelines(json.dumps(item) + "\n" for item in remaining)
+            else:
+                os.remove(self.spool_file)
+
+    def close(self, timeout=5.0):
+        """
+        Stop the publisher thread, send or spill the queued events and disconnect. Messages the broker
+        has not acknowledged within timeout seconds are spilled, so the next run sends them again.
+        """
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=self.batch_interval + 5)
+
+        # The network loop has to keep running until the last QoS 1 messages are acknowledged
+        deadline = time.monotonic() + timeout
+        unacknowledged = []
+        for info, topic, payload in self.in_flight:
+            try:
+                info.wait_for_publish(max(0.0, deadline - time.monotonic()))
+            except (RuntimeError, ValueError):
+                pass  # Connection lost while waiting
+            if not info.is_published():
+                unacknowledged.append((topic, payload))
+        self.in_flight.clear()
+        if unacknowledged:
+            self._spill(unacknowledged)
+
+        self.remote_client.disconnect()
+        self.remote_client.loop_stop()
+
+
+class MQTT:
+    def __init__(self, config=None):
+        # Use the configuration loaded once by the caller, load it only when run on its own
+        self.config = config if config is not None else load_config()
+        # Every MQTT in the process shares one connection
+        self.publisher = MQTTPublisher.instance(self.config)
 
     def publish_drinking(self, data):
-        self.remote_client.publish(self.config["topics"]["drinking_behaviour"], data)
\ No newline at end of file
+        self.publisher.publish(self.config["topics"]["drinking_behaviour"], data)
@@ -14,8 +14,46 @@ class Parser:
         self.parser.add_argument('--fps', type=int, default=1, help='Number of frames per second to process.')
         self.parser.add_argument('--grayscale', action='store_true', help='Convert the output video to grayscale.')
         self.parser.add_argument('--heatmap', action='store_true', help='Enable heatmap generation for pig movement.')
+        self.parser.add_argument('--heatmap-scale', type=int, default=1, help='Downscale factor of the heatmap grid; it is upsampled only for display.')
+        self.parser.add_argument('--heatmap-kernel', choices=['box', 'gaussian'], default='box', help='Stamp added around each pig center on the heatmap.')
         self.parser.add_argument('--headless', action='store_true', help='Run without video')
+        self.parser.add_argument('--analytics-only', action='store_true', help='Only compute events, heatmap statistics and CSV/MQTT output: no drawing, overlay or window events. Implies --headless.')
+        self.parser.add_argument('--cameras', action='store_true', help='The video source is a YAML file listing several cameras (name: url) that are processed together with shared models.')
+        self.parser.add_argument('--camera-max-fps', type=float, default=0.0, help='Maximum frames per second processed from one camera with --cameras, 0 for no limit besides --fps.')
+        self.parser.add_argument('--camera-batch-wait', type=float, default=0.05, help='Seconds the scheduler waits for frames from more cameras before running a partial batch.')
+        self.parser.add_argument('--camera-frames-per-batch', type=int, default=1, help='Maximum frames of one camera in one detector call, so every camera gets its share.')
+        self.parser.add_argument('--checkpoint', action='store_true', help='Record the progress of every video file; a restarted run skips finished videos and resumes the others from their last checkpoint.')
+        self.parser.add_argument('--checkpoint-interval', type=float, default=60.0, help='Seconds between checkpoints, besides the one after every CSV flush.')
+        self.parser.add_argument('--detection-cache', type=str, default=None, help='Folder of the detection caches: processed video files record their detector, flow and behaviour model outputs there, keyed by video content and model hash.')
+        self.parser.add_argument('--from-cache', action='store_true', help='Replay the behaviour logic from the --detection-cache of each video without decoding or inference. Implies --analytics-only.')
+        self.parser.add_argument('--reader-thread', action='store_true', help='Decode frames on a background thread while the current frame is processed.')
+        self.parser.add_argument('--device', type=str, default=None, help="Device to run the models on, e.g. 'cpu' or 'cuda:0'. Defaults to the Ultralytics choice.")
+        self.parser.add_argument('--behavior-crop', action='store_true', help='Run the behaviour model on the padded pig crop instead of the full frame.')
+        self.parser.add_argument('--behavior-imgsz', type=int, default=320, help='Behaviour model input size used with --behavior-crop.')
+        self.parser.add_argument('--csv-flush-rows', type=int, default=50, help='Write buffered CSV rows once this many are waiting.')
+        self.parser.add_argument('--csv-flush-interval', type=float, default=30.0, help='Write buffered CSV rows after this many seconds.')
+        self.parser.add_argument('--csv-fsync', action='store_true', help='fsync the CSV files on every flush so they survive a crash.')
+        self.parser.add_argument('--parquet', type=str, default=None, help='Also write behaviour events as typed columns to a Parquet dataset in this folder, partitioned by pen and day (requires pyarrow).')
+        self.parser.add_argument('--workers', type=int, default=1, help='Number of worker processes used when the video source is a directory.')
+        self.parser.add_argument('--batch-size', type=int, default=8, help='Number of sampled frames sent to the detector in one call when processing files (ignored with --live).')
+        self.parser.add_argument('--faucet-roi', choices=['config', 'learn'], default=None, help="Run the detector only on tiles around the faucets: 'config' uses faucet_left/faucet_right from config.yaml, 'learn' finds them on the full frame first.")
+        self.parser.add_argument('--roi-stable-frames', type=int, default=30, help='Frames a learned faucet must be seen at the same place before the tiles are used.')
+        self.parser.add_argument('--roi-tile-size', type=int, default=480, help='Side in pixels of the tile cropped around each faucet at native resolution.')
+        self.parser.add_argument('--motion-gate', action='store_true', help='Skip inference on frames without motion and reuse the previous detections.')
+        self.parser.add_argument('--motion-threshold', type=float, default=0.01, help='Fraction of changed pixels in the frame that counts as motion.')
+        self.parser.add_argument('--motion-faucet-threshold', type=float, default=0.002, help='Fraction of changed pixels inside a faucet region that counts as motion.')
+        self.parser.add_argument('--motion-pixel-threshold', type=int, default=15, help='Minimum grayscale difference (0-255) for a pixel to count as changed.')
+        self.parser.add_argument('--motion-max-skip', type=int, default=10, help='Run inference at least every N sampled frames, even without motion.')
+        self.parser.add_argument('--motion-ramp', type=int, default=4, help='Sample this many times more often while there is motion near a faucet.')
+        self.parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO', help='Lowest level of console messages; per-frame model results are DEBUG.')
+        self.parser.add_argument('--metrics', action='store_true', help='Time every pipeline stage and log fps and p50/p95/p99 latencies periodically.')
+        self.parser.add_argument('--metrics-interval', type=float, default=60.0, help='Seconds between metrics log lines and dump file updates.')
+        self.parser.add_argument('--metrics-file', type=str, default=None, help="Write the metrics to this file on every report, Prometheus text if it ends in '.prom', JSON otherwise.")
+        self.parser.add_argument('--queue-size', type=int, default=8, help='Maximum number of decoded frames buffered by the reader thread. With --live the oldest frame is dropped when full.')
 
     def parse_args(self):
         # Call parse_args() on the ArgumentParser instance
-        return self.parser.parse_args()
\ No newline at end of file
+        args = self.parser.parse_args()
+        if args.from_cache and not args.detection_cache:
+            self.parser.error('--from-cache needs --detection-cache')
+        return args
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""CSVLogger buffering: rows are only written, and on_flush only called, from flush_if_due() or close()."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from CSV import CSVLogger  # noqa: E402
+
+
+def message(n):
+    return {"start_frame": n * 100, "end_frame": n * 100 + 72, "behavior": "Drinking", "pig_id": 1,
+            "class": ["pig"], "confidence": [0.9], "coordinates": {"pig": (10, 20)}}
+
+
+def data_rows(path):
+    with open(path) as file:
+        return len(file.readlines()) - 1  # Header
+
+
+def test_full_buffer_is_written_on_the_next_flush_if_due(tmp_path):
+    flushes = []
+    logger = CSVLogger(str(tmp_path), "video.csv", flush_rows=2, flush_interval=3600)
+    logger.on_flush = lambda: flushes.append(data_rows(logger.filename))
+    try:
+        for n in range(3):
+            logger.log_behavior(message(n))
+        # The buffer is over flush_rows, but nothing is written in the middle of a frame
+        assert flushes == []
+        assert logger.flush_pending
+
+        logger.flush_if_due()
+        assert flushes == [3]
+        assert not logger.flush_pending
+
+        logger.flush_if_due()
+        assert flushes == [3]
+    finally:
+        logger.close()
+
+
+def test_close_writes_the_remaining_rows(tmp_path):
+    logger = CSVLogger(str(tmp_path), "video.csv", flush_rows=50, flush_interval=3600)
+    logger.log_behavior(message(0))
+    logger.close()
+    assert data_rows(os.path.join(str(tmp_path), "video.csv")) == 1
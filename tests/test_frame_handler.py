@@ -0,0 +1,51 @@
+"""Background reader of FrameHandler: the consumer sees the end of the capture, also when reading fails."""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from FrameHandler import FrameHandler  # noqa: E402
+
+
+def write_clip(path, frames=10):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("No mp4v encoder in this OpenCV build")
+    for n in range(frames):
+        writer.write(np.full((48, 64, 3), n * 20, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_reader_returns_every_frame_and_ends(tmp_path):
+    handler = FrameHandler(write_clip(tmp_path / "clip.mp4"))
+    handler.get_frame(1, 0)
+    handler.start_reader(1)
+    counts = []
+    frame, frame_count = handler.next_frame(1, 0)
+    while frame is not None:
+        counts.append(frame_count)
+        frame, frame_count = handler.next_frame(1, frame_count)
+    handler.release()
+    assert counts == list(range(1, 10))
+
+
+def test_reader_error_is_raised_in_the_consumer(tmp_path):
+    handler = FrameHandler(write_clip(tmp_path / "clip.mp4"))
+
+    def failing_read(process_interval, frame_count):
+        if frame_count >= 2:
+            raise RuntimeError("decoder failed")
+        return FrameHandler.get_sampled_frame(handler, process_interval, frame_count)
+
+    handler.get_sampled_frame = failing_read
+    handler.start_reader(1)
+    assert handler.next_frame(1, 0)[1] == 1
+    assert handler.next_frame(1, 1)[1] == 2
+    with pytest.raises(RuntimeError, match="decoder failed"):
+        handler.next_frame(1, 2)
+    handler.release()
+    assert handler.reader_thread is None
@@ -0,0 +1,149 @@
+"""
+MQTTPublisher against a minimal local MQTT 3.1.1 broker: events published while the broker
+is down are spilled to the spool file of the process and re-sent once the client reconnects.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("paho.mqtt.client")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from mqtt import MQTTPublisher  # noqa: E402
+
+
+class StandInBroker:
+    """Accepts connections and acknowledges QoS 0/1 publishes, recording (topic, payload)."""
+
+    def __init__(self, port):
+        self.messages = []
+        self.server = socket.create_server(("127.0.0.1", port))
+        self.server.settimeout(0.2)
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(target=self._client, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read(conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    def _client(self, conn):
+        try:
+            while self.running:
+                header = self._read(conn, 1)[0]
+                length, shift = 0, 0
+                while True:
+                    byte = self._read(conn, 1)[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = self._read(conn, length)
+                kind, flags = header >> 4, header & 0x0F
+
+                if kind == 1:  # CONNECT
+                    conn.sendall(bytes([0x20, 2, 0, 0]))
+                elif kind == 3:  # PUBLISH
+                    topic_length = int.from_bytes(body[:2], "big")
+                    topic = body[2:2 + topic_length].decode()
+                    rest = body[2 + topic_length:]
+                    qos = (flags >> 1) & 3
+                    packet_id, payload = (rest[:2], rest[2:]) if qos else (None, rest)
+                    # Record before acknowledging, so an acknowledged message is always in messages
+                    self.messages.append((topic, payload.decode()))
+                    if qos:
+                        conn.sendall(bytes([0x40, 2]) + packet_id)
+                elif kind == 12:  # PINGREQ
+                    conn.sendall(bytes([0xD0, 0]))
+                elif kind == 14:  # DISCONNECT
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.server.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def make_publisher(port, spool_file):
+    config = {"mqtt": {"host": "127.0.0.1", "port": port, "user": "test", "password": "test",
+                       "batch_interval": 0.5, "spool_file": str(spool_file)}}
+    return MQTTPublisher(config)
+
+
+def test_spilled_events_are_resent_after_reconnecting(tmp_path):
+    port = free_port()
+    publisher = make_publisher(port, tmp_path / "mqtt_spool.jsonl")
+    try:
+        # No broker yet: the events end up in the spool file of this process
+        for n in range(3):
+            publisher.publish("pigs/drinking", f"event {n}")
+        assert wait_for(lambda: os.path.exists(publisher.spool_file))
+        assert publisher.spool_file == str(tmp_path / f"mqtt_spool.{os.getpid()}.jsonl")
+
+        broker = StandInBroker(port)
+        try:
+            assert wait_for(lambda: len(broker.messages) == 3)
+            assert [payload for _, payload in broker.messages] == ["event 0", "event 1", "event 2"]
+            assert wait_for(lambda: not os.path.exists(publisher.spool_file))
+
+            # Connected: new events go straight to the broker and are acknowledged before close returns
+            publisher.publish("pigs/drinking", "event 3")
+            publisher.close()
+            assert broker.messages[-1] == ("pigs/drinking", "event 3")
+        finally:
+            broker.stop()
+    finally:
+        publisher.close()
+
+
+def test_spool_of_exited_process_is_adopted(tmp_path):
+    # A pid that is not running: the spool file of a worker that has exited
+    orphan = tmp_path / "mqtt_spool.999999999.jsonl"
+    orphan.write_text(json.dumps({"topic": "pigs/drinking", "payload": "orphan"}) + "\n")
+
+    port = free_port()
+    broker = StandInBroker(port)
+    publisher = make_publisher(port, tmp_path / "mqtt_spool.jsonl")
+    try:
+        assert not orphan.exists()
+        assert wait_for(lambda: ("pigs/drinking", "orphan") in broker.messages)
+    finally:
+        publisher.close()
+        broker.stop()
@@ -0,0 +1,49 @@
+"""PigFlow on consecutive frames: the flow of a tracked pig follows the textured patch that moves."""
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from OpticalFlow import PigFlow  # noqa: E402
+
+
+def textured_frame(offset, width=320, height=240):
+    """Dark frame with a random texture patch (the pig) shifted by offset pixels."""
+    rng = np.random.default_rng(0)
+    patch = rng.integers(0, 255, (60, 80), dtype=np.uint8)
+    patch = np.kron(patch[::4, ::4], np.ones((4, 4), dtype=np.uint8))  # Blocky texture with strong corners
+    frame = np.full((height, width, 3), 30, dtype=np.uint8)
+    x, y = 120 + offset[0], 90 + offset[1]
+    frame[y:y + 60, x:x + 80] = patch[:, :, None]
+    return frame
+
+
+def pig(offset):
+    x, y = 120 + offset[0], 90 + offset[1]
+    return ("Pig-standing", [x, y, x + 80, y + 60], 0.9)
+
+
+def test_flow_of_a_track_over_consecutive_frames():
+    flow = PigFlow()
+    assert flow.update(textured_frame((0, 0)), [(1, pig((0, 0)))]) == {}
+
+    vectors = flow.update(textured_frame((3, 2)), [(1, pig((3, 2)))])
+    dx, dy = vectors[1]
+    assert dx == pytest.approx(3, abs=0.5)
+    assert dy == pytest.approx(2, abs=0.5)
+    old, new = flow.pairs[1]
+    assert old.shape == new.shape and old.shape[1] == 2
+
+    # A third frame keeps working on the cached region of the track
+    vectors = flow.update(textured_frame((5, 2)), [(1, pig((5, 2)))])
+    assert vectors[1][0] == pytest.approx(2, abs=0.5)
+
+
+def test_tracks_that_disappear_are_forgotten():
+    flow = PigFlow()
+    flow.update(textured_frame((0, 0)), [(1, pig((0, 0)))])
+    assert flow.update(textured_frame((0, 0)), []) == {}
+    assert flow.state == {}